@@ -7,9 +7,12 @@ from logging import getLogger
 import psycopg
 import requests
 from ijproblems_admin.database import (
+    add_solvers,
+    bump_data_version,
     get_postgres_url,
     insert_aoj_aceptance,
     recompute_point,
+    refresh_user_ranks,
 )
 
 logger = getLogger(__name__)
@@ -31,6 +34,9 @@ def main(conn: psycopg.Connection) -> None:
     logger.debug(f"CRAWL_INTERVAL_SECOND={crawl_interval_second}")
 
     problem_ids: list[int] = []
+    # contest types whose user_points changed since user_ranks was rebuilt;
+    # all of them at start, in case a previous run stopped in between
+    stale_rankings: set[int] = {0, 1}
 
     def crawl_problem(problem_id: int) -> bool:
         # TODO: Use pager when size limit reaches
@@ -63,9 +69,16 @@ def main(conn: psycopg.Connection) -> None:
                 if inserted_rows:
                     users_recompute.append(aoj_userid)
 
+            changed: set[int] = set()
             for aoj_userid in users_recompute:
-                recompute_point(cursor, aoj_userid)
+                changed |= recompute_point(cursor, aoj_userid)
+
+            if users_recompute:
+                add_solvers(cursor, problem_id, len(users_recompute))
+                bump_data_version(cursor, "crawl", users=sorted(users_recompute))
+            bump_data_version(cursor, "crawl_run")
         conn.commit()
+        stale_rankings.update(changed)
 
         logger.info(f"crawl for {problem_id} ok")
         logger.info(f"recomputed users = {len(users_recompute)}")
@@ -88,6 +101,8 @@ def main(conn: psycopg.Connection) -> None:
 
         with conn.cursor() as cursor:
             users_recompute = set()
+            inserted_rows = 0
+            new_solvers: dict[int, int] = {}
             for solution in solutions:
                 problem_id_str = solution["problemId"]
                 if not problem_id_str.isdigit():
@@ -97,17 +112,44 @@ def main(conn: psycopg.Connection) -> None:
                     continue
                 aoj_userid = solution["userId"]
                 date_unixmilli = solution["submissionDate"]
-                insert_aoj_aceptance(cursor, aoj_userid, problem_id, date_unixmilli)
+                inserted = insert_aoj_aceptance(
+                    cursor, aoj_userid, problem_id, date_unixmilli
+                )
+                if inserted:
+                    new_solvers[problem_id] = new_solvers.get(problem_id, 0) + inserted
+                inserted_rows += inserted
                 users_recompute.add(aoj_userid)
 
+            changed: set[int] = set()
             for aoj_userid in users_recompute:
-                recompute_point(cursor, aoj_userid)
+                changed |= recompute_point(cursor, aoj_userid)
+
+            for problem_id, solvers in sorted(new_solvers.items()):
+                add_solvers(cursor, problem_id, solvers)
+
+            # the latest status mostly repeats what is already stored
+            if inserted_rows:
+                bump_data_version(cursor, "crawl", users=sorted(users_recompute))
+            bump_data_version(cursor, "crawl_run")
 
         conn.commit()
+        stale_rankings.update(changed)
         logger.info("crawl for latest status ok")
         logger.info(f"recomputed users = {len(users_recompute)}")
         return True
 
+    def refresh_rankings() -> None:
+        # rewriting user_ranks is the heavy part of a crawl, so it is done
+        # once per cycle and only for the contest types that changed
+        if not stale_rankings:
+            return
+        with conn.cursor() as cursor:
+            refresh_user_ranks(cursor, sorted(stale_rankings))
+            bump_data_version(cursor, "crawl")
+        conn.commit()
+        logger.info(f"rankings refreshed for contest types {sorted(stale_rankings)}")
+        stale_rankings.clear()
+
     while True:
         if len(problem_ids) == 0:
             problem_ids = get_problem_ids(conn)
@@ -121,6 +163,7 @@ def main(conn: psycopg.Connection) -> None:
         time.sleep(crawl_interval_second)
         while not crawl_latest_status():
             time.sleep(crawl_interval_second)
+        refresh_rankings()
 
         time.sleep(crawl_interval_second)
 
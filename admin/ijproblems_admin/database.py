@@ -1,6 +1,7 @@
 import json
 import os
 from datetime import datetime
+from typing import Any, Optional
 
 import psycopg
 
@@ -36,8 +37,13 @@ POINTS = [
 ]
 
 
-def recompute_point(cursor: psycopg.Cursor, aoj_userid: str) -> None:
+def recompute_point(cursor: psycopg.Cursor, aoj_userid: str) -> set[int]:
+    """Recompute user_points of `aoj_userid`.
+
+    Returns the contest types whose points of the user changed.
+    """
     aoj_userid = aoj_userid.lower()
+    changed = set()
     res = cursor.execute(
         "SELECT P.level AS level, P.contest_type AS contest_type, COUNT(*) AS count "
         "FROM aoj_acceptances AS A "
@@ -63,7 +69,9 @@ def recompute_point(cursor: psycopg.Cursor, aoj_userid: str) -> None:
             "VALUES (%(aoj_userid)s, %(contest_type)s, %(total)s, %(counts)s)"
             "ON CONFLICT (aoj_userid, contest_type) DO UPDATE "
             "SET total = EXCLUDED.total, "
-            "counts_per_levels = EXCLUDED.counts_per_levels",
+            "counts_per_levels = EXCLUDED.counts_per_levels "
+            "WHERE (user_points.total, user_points.counts_per_levels) "
+            "IS DISTINCT FROM (EXCLUDED.total, EXCLUDED.counts_per_levels)",
             {
                 "aoj_userid": aoj_userid,
                 "total": total,
@@ -71,3 +79,161 @@ def recompute_point(cursor: psycopg.Cursor, aoj_userid: str) -> None:
                 "counts": counts,
             },
         )
+        if cursor.rowcount:
+            changed.add(contest_type)
+    return changed
+
+
+# must match ijproblems.internal_functions.invalidation
+INVALIDATION_CHANNEL = "invalidation"
+# NOTIFY payloads must be shorter than 8000 bytes
+INVALIDATION_PAYLOAD_MAX_BYTES = 7900
+
+
+def bump_data_version(cursor: psycopg.Cursor, name: str, **details: Any) -> None:
+    """Tell web workers (caches, ETags) that the data behind `name` changed.
+
+    Workers are notified on commit. `details` say what exactly changed and
+    are dropped when they do not fit in a notification.
+    """
+    cursor.execute(
+        "UPDATE data_versions "
+        "SET version = version + 1, updated_at = now() AT TIME ZONE 'UTC' "
+        "WHERE name = %(name)s "
+        "RETURNING version, updated_at",
+        {"name": name},
+    )
+    row = cursor.fetchone()
+    if row is None:
+        return
+    version, updated_at = row
+    event = {"data": name, "version": version, "updated_at": updated_at.isoformat()}
+    payload = json.dumps({**event, **details})
+    if len(payload.encode()) > INVALIDATION_PAYLOAD_MAX_BYTES:
+        payload = json.dumps(event)
+    cursor.execute(
+        "SELECT pg_notify(%(channel)s, %(payload)s)",
+        {"channel": INVALIDATION_CHANNEL, "payload": payload},
+    )
+
+
+def refresh_user_ranks(cursor: psycopg.Cursor, contest_types: list[int]) -> None:
+    """Rebuild user_ranks of `contest_types` from user_points.
+
+    Readers keep seeing the previous ranking until the transaction commits.
+    """
+    params = {"contest_types": contest_types}
+    cursor.execute(
+        "DELETE FROM user_ranks WHERE contest_type = ANY(%(contest_types)s)", params
+    )
+    cursor.execute(
+        "INSERT INTO user_ranks "
+        "(contest_type, position, rank, aoj_userid, total, counts_per_levels) "
+        "SELECT contest_type, "
+        "ROW_NUMBER() OVER ("
+        "PARTITION BY contest_type ORDER BY total DESC, aoj_userid"
+        "), "
+        "RANK() OVER (PARTITION BY contest_type ORDER BY total DESC), "
+        "aoj_userid, total, counts_per_levels "
+        "FROM user_points "
+        "WHERE contest_type = ANY(%(contest_types)s)",
+        params,
+    )
+
+
+def rebuild_like_counts(
+    cursor: psycopg.Cursor, problem_ids: Optional[list[int]] = None
+) -> None:
+    """Recompute problem_likes from the likes table.
+
+    If `problem_ids` is None, every problem is recomputed.
+    """
+    # lock existing counters first so that like toggles in flight are either
+    # committed before the recount or wait until it is done
+    cursor.execute(
+        "SELECT problem_id FROM problem_likes "
+        "WHERE %(problem_ids)s::INTEGER[] IS NULL "
+        "OR problem_id = ANY(%(problem_ids)s) "
+        "FOR UPDATE",
+        {"problem_ids": problem_ids},
+    )
+    cursor.execute(
+        "INSERT INTO problem_likes (problem_id, likes) "
+        "SELECT P.problem_id, P.inherited_likes + COUNT(L.github_id) "
+        "FROM problems AS P "
+        "LEFT JOIN likes AS L ON P.problem_id = L.problem_id "
+        "WHERE %(problem_ids)s::INTEGER[] IS NULL "
+        "OR P.problem_id = ANY(%(problem_ids)s) "
+        "GROUP BY P.problem_id "
+        "ON CONFLICT (problem_id) DO UPDATE "
+        "SET likes = EXCLUDED.likes, version = problem_likes.version + 1 "
+        "WHERE problem_likes.likes <> EXCLUDED.likes",
+        {"problem_ids": problem_ids},
+    )
+
+
+def find_like_count_drifts(cursor: psycopg.Cursor) -> list[tuple[int, int, int]]:
+    """Return (problem_id, stored, expected) for every mismatching counter."""
+    res = cursor.execute(
+        "SELECT P.problem_id, PL.likes, P.inherited_likes + COUNT(L.github_id) "
+        "FROM problems AS P "
+        "LEFT JOIN problem_likes AS PL ON P.problem_id = PL.problem_id "
+        "LEFT JOIN likes AS L ON P.problem_id = L.problem_id "
+        "GROUP BY P.problem_id, PL.likes "
+        "HAVING PL.likes IS DISTINCT FROM P.inherited_likes + COUNT(L.github_id) "
+        "ORDER BY P.problem_id"
+    ).fetchall()
+    return [(problem_id, stored or 0, expected) for problem_id, stored, expected in res]
+
+
+def add_solvers(cursor: psycopg.Cursor, problem_id: int, solvers: int) -> None:
+    """Add newly inserted acceptances of a problem to its problem_solvers counter."""
+    cursor.execute(
+        "INSERT INTO problem_solvers (problem_id, solvers) "
+        "VALUES (%(problem_id)s, %(solvers)s) "
+        "ON CONFLICT (problem_id) DO UPDATE "
+        "SET solvers = problem_solvers.solvers + EXCLUDED.solvers",
+        {"problem_id": problem_id, "solvers": solvers},
+    )
+
+
+def rebuild_solver_counts(
+    cursor: psycopg.Cursor, problem_ids: Optional[list[int]] = None
+) -> None:
+    """Recompute problem_solvers from the aoj_acceptances table.
+
+    If `problem_ids` is None, every problem is recomputed.
+    """
+    # same locking as rebuild_like_counts, against a crawl in flight
+    cursor.execute(
+        "SELECT problem_id FROM problem_solvers "
+        "WHERE %(problem_ids)s::INTEGER[] IS NULL "
+        "OR problem_id = ANY(%(problem_ids)s) "
+        "FOR UPDATE",
+        {"problem_ids": problem_ids},
+    )
+    cursor.execute(
+        "INSERT INTO problem_solvers (problem_id, solvers) "
+        "SELECT P.problem_id, COUNT(A.aoj_userid) "
+        "FROM problems AS P "
+        "LEFT JOIN aoj_acceptances AS A ON P.problem_id = A.problem_id "
+        "WHERE %(problem_ids)s::INTEGER[] IS NULL "
+        "OR P.problem_id = ANY(%(problem_ids)s) "
+        "GROUP BY P.problem_id "
+        "ON CONFLICT (problem_id) DO UPDATE SET solvers = EXCLUDED.solvers",
+        {"problem_ids": problem_ids},
+    )
+
+
+def find_solver_count_drifts(cursor: psycopg.Cursor) -> list[tuple[int, int, int]]:
+    """Return (problem_id, stored, expected) for every mismatching counter."""
+    res = cursor.execute(
+        "SELECT P.problem_id, PS.solvers, COUNT(A.aoj_userid) "
+        "FROM problems AS P "
+        "LEFT JOIN problem_solvers AS PS ON P.problem_id = PS.problem_id "
+        "LEFT JOIN aoj_acceptances AS A ON P.problem_id = A.problem_id "
+        "GROUP BY P.problem_id, PS.solvers "
+        "HAVING PS.solvers IS DISTINCT FROM COUNT(A.aoj_userid) "
+        "ORDER BY P.problem_id"
+    ).fetchall()
+    return [(problem_id, stored or 0, expected) for problem_id, stored, expected in res]
@@ -0,0 +1,42 @@
+"""
+Verify or rebuild the per-problem like counters (problem_likes)
+against the likes table.
+"""
+
+import argparse
+import sys
+
+import psycopg
+from ijproblems_admin.database import (
+    bump_data_version,
+    find_like_count_drifts,
+    get_postgres_url,
+    rebuild_like_counts,
+)
+
+
+def main(conn: psycopg.Connection) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["verify", "rebuild"])
+    args = parser.parse_args()
+
+    with conn.cursor() as cursor:
+        drifts = find_like_count_drifts(cursor)
+        for problem_id, stored, expected in drifts:
+            print(f"* AOJ {problem_id}: stored={stored} expected={expected}")
+        print(f"{len(drifts)} drifted counters found")
+
+        if args.command == "verify":
+            return 1 if drifts else 0
+
+        rebuild_like_counts(cursor)
+        bump_data_version(cursor, "likes")
+    conn.commit()
+    print("Rebuilt all counters")
+    return 0
+
+
+if __name__ == "__main__":
+    url = get_postgres_url()
+    with psycopg.connect(url) as conn:
+        sys.exit(main(conn))
@@ -14,6 +14,11 @@ from typing import Any
 
 import psycopg
 import requests
+from ijproblems_admin.database import (
+    bump_data_version,
+    rebuild_like_counts,
+    rebuild_solver_counts,
+)
 from psycopg.rows import class_row
 
 
@@ -215,6 +220,24 @@ def main(conn: psycopg.Connection) -> None:
                 dataclasses.asdict(problem),
             )
 
+        # inherited_likes may have changed, and new problems need a counter
+        rebuild_like_counts(
+            cursor,
+            [problem.problem_id for problem in update_problems + create_problems],
+        )
+        rebuild_solver_counts(
+            cursor, [problem.problem_id for problem in create_problems]
+        )
+
+        # web workers reload their in-memory problem catalog on version change
+        bump_data_version(
+            cursor,
+            "catalog",
+            problems=sorted(
+                problem.problem_id for problem in update_problems + create_problems
+            ),
+        )
+
 
 if __name__ == "__main__":
     user = os.environ["POSTGRES_USER"]
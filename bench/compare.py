@@ -0,0 +1,70 @@
+"""
+Compare two result files of `bench.run`.
+
+    python -m bench.compare bench/results/base.json bench/results/new.json
+
+Exits with 1 if a scenario got slower than `--threshold` percent at p50 or
+p95, or if it returned errors that the base did not.
+"""
+
+import argparse
+import json
+import sys
+from typing import Any
+
+METRICS = ["p50", "p95", "p99"]
+
+
+def _load(path: str) -> dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+def _change(base: float, new: float) -> float:
+    return (new - base) / base * 100 if base else 0.0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    args = parser.parse_args()
+
+    base = _load(args.base)
+    new = _load(args.new)
+    print(f"base: {base['environment']['commit']} ({base['environment']['backend']})")
+    print(f"new:  {new['environment']['commit']} ({new['environment']['backend']})")
+
+    regressed = False
+    header = f"{'scenario':24} {'req/s':>18}" + "".join(
+        f" {metric + ' ms':>21}" for metric in METRICS
+    )
+    print(header)
+    for name, new_result in new["scenarios"].items():
+        base_result = base["scenarios"].get(name)
+        if base_result is None:
+            print(f"{name:24} (not in base)")
+            continue
+
+        base_rps = base_result["throughput_rps"]
+        new_rps = new_result["throughput_rps"]
+        line = f"{name:24} {new_rps:9.1f} {_change(base_rps, new_rps):+7.1f}%"
+        for metric in METRICS:
+            base_ms = base_result["latency_ms"][metric]
+            new_ms = new_result["latency_ms"][metric]
+            change = _change(base_ms, new_ms)
+            marker = " "
+            if metric in ("p50", "p95") and change > args.threshold:
+                marker = "!"
+                regressed = True
+            line += f" {new_ms:11.2f} {change:+7.1f}%{marker}"
+        if new_result["errors"] > base_result["errors"]:
+            line += f"  errors {base_result['errors']} -> {new_result['errors']}"
+            regressed = True
+        print(line)
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,318 @@
+"""
+Route-level benchmark of the web app.
+
+`main:app` is driven in-process through an ASGI client, so the numbers cover
+routing, data access and rendering but not the network or uvicorn.
+
+    python -m bench.run --backend mock
+    python -m bench.run --backend postgres --output bench/results/base.json
+
+The postgres backend uses the usual POSTGRES_* variables (POSTGRES_HOST for a
+locally started server) and expects a loaded database. The like scenario
+likes and unlikes problems as BENCH_GITHUB_ID and removes its likes at the end.
+Compare two result files with `python -m bench.compare`.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from http.cookies import SimpleCookie
+from typing import Any, Optional
+
+import httpx
+from itsdangerous import TimestampSigner
+
+# never a real GitHub account
+BENCH_GITHUB_ID = -1
+PERCENTILES = [50, 90, 95, 99]
+
+
+@dataclass
+class Request:
+    method: str
+    url: str
+    cookies: dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class Targets:
+    """IDs discovered through the JSON API, so that any data set works."""
+
+    aoj_ids: list[int]
+    aoj_userids: list[list[str]]
+    page_counts: list[int]
+
+
+def _cookie_header(cookies: dict[str, str]) -> str:
+    jar: SimpleCookie = SimpleCookie()
+    for key, value in cookies.items():
+        jar[key] = value
+    return "; ".join(morsel.OutputString() for morsel in jar.values())
+
+
+def _preference_cookie(**preference: Any) -> dict[str, str]:
+    value = {
+        "ja": True,
+        "en": True,
+        "contest_type": 0,
+        "aoj_userid": "",
+        "rivals": [],
+        "hide_solved": False,
+        "level_scopes": [0, 0],
+        **preference,
+    }
+    return {"preference": json.dumps(value)}
+
+
+def _session_cookie(secret: str, github_id: int) -> dict[str, str]:
+    # the same format as starlette's SessionMiddleware
+    session = {"github_id": github_id, "github_login": "bench"}
+    data = base64.b64encode(json.dumps(session).encode())
+    return {"session": TimestampSigner(secret).sign(data).decode()}
+
+
+def build_scenarios(
+    targets: Targets, rng: random.Random, n: int, session: dict[str, str]
+) -> dict[str, list[Request]]:
+    def user(contest_type: int = 0) -> str:
+        return rng.choice(targets.aoj_userids[contest_type])
+
+    def page(contest_type: int) -> int:
+        return rng.randint(1, targets.page_counts[contest_type])
+
+    liked = [rng.choice(targets.aoj_ids) for _ in range(n)]
+    scenarios: dict[str, list[Request]] = {
+        "problems": [Request("GET", "/") for _ in range(n)],
+        "problems_rivals": [
+            Request(
+                "GET",
+                "/",
+                _preference_cookie(
+                    aoj_userid=user(),
+                    rivals=[user() for _ in range(rng.randint(3, 10))],
+                ),
+            )
+            for _ in range(n)
+        ],
+        "problems_hide_solved": [
+            Request(
+                "GET",
+                "/?contest_type=1",
+                _preference_cookie(
+                    contest_type=1,
+                    aoj_userid=user(1),
+                    rivals=[user(1) for _ in range(3)],
+                    hide_solved=True,
+                ),
+            )
+            for _ in range(n)
+        ],
+        "ranking": [
+            Request("GET", f"/ranking/{contest_type}/{page(contest_type)}")
+            for contest_type in (rng.randint(0, 1) for _ in range(n))
+        ],
+        "problem": [
+            Request("GET", f"/problem/{rng.choice(targets.aoj_ids)}") for _ in range(n)
+        ],
+        "user": [
+            Request("GET", f"/user/{user(contest_type)}/{contest_type}")
+            for contest_type in (rng.randint(0, 1) for _ in range(n))
+        ],
+        "like": [
+            Request(
+                "POST",
+                f"/api/user/like?aoj_id={aoj_id}&value={rng.randint(0, 1)}",
+                session,
+            )
+            for aoj_id in liked
+        ],
+    }
+    return scenarios
+
+
+async def discover_targets(client: httpx.AsyncClient) -> Targets:
+    aoj_ids: list[int] = []
+    aoj_userids: list[list[str]] = []
+    page_counts: list[int] = []
+    for contest_type in (0, 1):
+        problems = (
+            await client.get(f"/api/problems?contest_type={contest_type}")
+        ).json()
+        column = problems["fields"].index("aoj_id")
+        aoj_ids.extend(row[column] for row in problems["rows"])
+
+        ranking = (await client.get(f"/api/ranking/{contest_type}?page=1")).json()
+        column = ranking["fields"].index("aoj_userid")
+        rows = ranking["rows"]
+        aoj_userids.append([row[column] for row in rows] or ["nobody"])
+        page_counts.append(max(1, -(-ranking["user_count"] // max(len(rows), 1))))
+    return Targets(aoj_ids=aoj_ids, aoj_userids=aoj_userids, page_counts=page_counts)
+
+
+async def send(client: httpx.AsyncClient, request: Request) -> httpx.Response:
+    headers = {}
+    if request.cookies:
+        headers["Cookie"] = _cookie_header(request.cookies)
+    return await client.request(request.method, request.url, headers=headers)
+
+
+def _percentile(sorted_values: list[float], percent: float) -> float:
+    # nearest rank
+    if not sorted_values:
+        return 0.0
+    index = max(0, -(-len(sorted_values) * percent // 100) - 1)
+    return sorted_values[int(index)]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient, requests: list[Request], concurrency: int
+) -> dict[str, Any]:
+    latencies: list[float] = []
+    errors = 0
+    pending = iter(requests)
+
+    async def worker() -> None:
+        nonlocal errors
+        for request in pending:
+            started = time.perf_counter()
+            response = await send(client, request)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    milliseconds = [latency * 1000 for latency in latencies]
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(milliseconds) / len(milliseconds), 3),
+            **{
+                f"p{percent}": round(_percentile(milliseconds, percent), 3)
+                for percent in PERCENTILES
+            },
+            "max": round(milliseconds[-1], 3),
+        },
+    }
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _environment(args: argparse.Namespace) -> dict[str, Any]:
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": args.backend,
+        "async_db": args.async_db,
+        "requests": args.requests,
+        "warmup": args.warmup,
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+        "settings": {
+            key: value
+            for key, value in sorted(os.environ.items())
+            if key.startswith(("MOCK_", "CATALOG_", "FRAGMENT_", "STREAM_"))
+        },
+    }
+
+
+async def benchmark(args: argparse.Namespace) -> dict[str, Any]:
+    # the backend is chosen when the app is imported
+    import main
+
+    rng = random.Random(args.seed)
+    session = _session_cookie(os.environ.get("SESSION_SECRET", "ija"), BENCH_GITHUB_ID)
+    transport = httpx.ASGITransport(app=main.app)  # type: ignore[arg-type]
+    results: dict[str, Any] = {}
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://bench"
+        ) as client:
+            targets = await discover_targets(client)
+            scenarios = build_scenarios(
+                targets, rng, args.warmup + args.requests, session
+            )
+            for name, requests in scenarios.items():
+                if args.scenario and name not in args.scenario:
+                    continue
+                for request in requests[: args.warmup]:
+                    await send(client, request)
+                results[name] = await run_scenario(
+                    client, requests[args.warmup :], args.concurrency
+                )
+                print(
+                    f"{name:24} {results[name]['throughput_rps']:10.1f} req/s"
+                    f"  p50 {results[name]['latency_ms']['p50']:8.2f} ms"
+                    f"  p99 {results[name]['latency_ms']['p99']:8.2f} ms"
+                    f"  errors {results[name]['errors']}",
+                    file=sys.stderr,
+                )
+
+            if "like" in results:
+                for request in scenarios["like"]:
+                    await send(client, Request("POST", request.url[:-1] + "0", session))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["mock", "postgres"], default="mock")
+    parser.add_argument("--async-db", action="store_true")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scenario", action="append")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    if args.requests < 1:
+        parser.error("--requests must be positive")
+
+    if args.backend == "mock":
+        os.environ["USE_MOCK"] = "1"
+    else:
+        os.environ.pop("USE_MOCK", None)
+    if args.async_db:
+        os.environ["USE_ASYNC_DB"] = "1"
+    os.environ.pop("DUMMY_LOGIN", None)
+
+    report = {
+        "environment": _environment(args),
+        "scenarios": asyncio.run(benchmark(args)),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 import os
 from typing import Any
 
-from ijproblems.internal_functions.interface import InterfaceInternalFunctions
+from ijproblems.internal_functions.interface import (
+    AsyncInterfaceInternalFunctions,
+    InterfaceInternalFunctions,
+)
 
 
 def get_internal_functions(*args: Any) -> InterfaceInternalFunctions:
@@ -13,3 +16,19 @@ def get_internal_functions(*args: Any) -> InterfaceInternalFunctions:
         from ijproblems.internal_functions.impl import ImplInternalFunctions  # noqa
 
         return ImplInternalFunctions(*args)
+
+
+def get_async_internal_functions(*args: Any) -> AsyncInterfaceInternalFunctions:
+    if os.environ.get("USE_MOCK"):
+        from ijproblems.internal_functions.mock import MockInternalFunctions  # noqa
+        from ijproblems.internal_functions.threaded import (  # noqa
+            ThreadedInternalFunctions,
+        )
+
+        return ThreadedInternalFunctions(MockInternalFunctions(*args))
+    else:
+        from ijproblems.internal_functions.async_impl import (  # noqa
+            AsyncImplInternalFunctions,
+        )
+
+        return AsyncImplInternalFunctions(*args)
@@ -0,0 +1,188 @@
+import asyncio
+from typing import AbstractSet, Any, Optional, TypeVar
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from ijproblems.internal_functions.interface import (
+    AsyncInterfaceInternalFunctions,
+    DataVersion,
+    GitHubLoginInfo,
+    PageContext,
+    PageContextQuery,
+    Preference,
+    ProblemInfo,
+    RankingRow,
+    UserRank,
+    session_github_login_info,
+)
+from ijproblems.internal_functions.plans import (
+    SOLVED_INDEX_BATCH_SIZE,
+    Plan,
+    Step,
+    catalog_plan,
+    contest_likes_version_plan,
+    data_versions_plan,
+    likes_plan,
+    likes_version_plan,
+    page_context_plan,
+    problems_plan,
+    set_like_plan,
+    solved_index_batch_query,
+)
+from ijproblems.internal_functions.points import POINTS
+from ijproblems.internal_functions.queries import (
+    Query,
+    global_ranking_query,
+    problem_query,
+    solved_user_count_query,
+    user_count_query,
+    user_local_ranking_query,
+    user_rank_query,
+)
+from ijproblems.internal_functions.solved_index import SolvedIndex, solved_index
+
+T = TypeVar("T")
+
+# created lazily so that it belongs to the running event loop
+_solved_index_refresh_lock: Optional[asyncio.Lock] = None
+
+
+class AsyncImplInternalFunctions(AsyncInterfaceInternalFunctions):
+    """Database backend on an `AsyncConnectionPool`.
+
+    Every step of a plan checks out a connection for as long as it runs;
+    the statements of one step are sent in one pipeline.
+    """
+
+    def __init__(self, pool: AsyncConnectionPool) -> None:
+        self.pool = pool
+
+    async def _run(self, query: Query[T]) -> T:
+        if query.commit:
+            return (await self._run_pipeline({"result": query}))["result"]
+        async with self.pool.connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cursor:
+                await cursor.execute(query.sql, query.params)
+                return query.parse(await cursor.fetchall())
+
+    async def _run_pipeline(self, queries: dict[str, Query[Any]]) -> dict[str, Any]:
+        if not queries:
+            return {}
+        async with self.pool.connection() as conn:
+            # the statements, and the commit of writing ones, share one round trip
+            async with conn.pipeline():
+                cursors = {}
+                for key, value in queries.items():
+                    cursor = conn.cursor(row_factory=dict_row)
+                    await cursor.execute(value.sql, value.params)
+                    cursors[key] = cursor
+                if any(value.commit for value in queries.values()):
+                    await conn.commit()
+            return {
+                key: queries[key].parse(await cursor.fetchall())
+                for key, cursor in cursors.items()
+            }
+
+    async def _execute(self, plan: Plan[T]) -> T:
+        result: Any = None
+        try:
+            while True:
+                step: Step = plan.send(result)
+                if isinstance(step, dict):
+                    result = await self._run_pipeline(step)
+                else:
+                    result = await self._run(step)
+        except StopIteration as stop:
+            return stop.value
+
+    def get_points(self, contest_type: int) -> list[int]:
+        return POINTS[contest_type]
+
+    async def get_problems(
+        self, preference: Preference, user_solved_problems: AbstractSet[int]
+    ) -> list[ProblemInfo]:
+        return await self._execute(problems_plan(preference, user_solved_problems))
+
+    async def get_problem(self, aoj_id: int) -> Optional[ProblemInfo]:
+        return await self._run(problem_query(aoj_id))
+
+    async def get_solved_user_count(self, aoj_id: int) -> int:
+        return await self._run(solved_user_count_query(aoj_id))
+
+    async def get_problems_total_row(self, contest_type: int) -> RankingRow:
+        return (await self._execute(catalog_plan())).total_row(contest_type)
+
+    async def get_global_ranking(
+        self, contest_type: int, begin: int, end: int
+    ) -> list[RankingRow]:
+        return await self._run(global_ranking_query(contest_type, begin, end))
+
+    async def get_user_count(self, contest_type: int) -> int:
+        return await self._run(user_count_query(contest_type))
+
+    def get_github_login_info(self, request: Request) -> Optional[GitHubLoginInfo]:
+        return session_github_login_info(request)
+
+    async def get_likes(self, github_id: int) -> set[int]:
+        return await self._execute(likes_plan(github_id))
+
+    async def set_like(self, github_id: int, aoj_id: int, value: int) -> int:
+        return await self._execute(set_like_plan(github_id, aoj_id, value))
+
+    async def get_user_local_ranking(
+        self, contest_type: int, aoj_userids: list[str]
+    ) -> list[RankingRow]:
+        return await self._run(user_local_ranking_query(contest_type, aoj_userids))
+
+    async def _get_solved_index(self) -> SolvedIndex:
+        global _solved_index_refresh_lock
+        if not solved_index.needs_refresh():
+            return solved_index
+
+        if _solved_index_refresh_lock is None:
+            _solved_index_refresh_lock = asyncio.Lock()
+        # a loaded index is served as it is while another task tails rows
+        if _solved_index_refresh_lock.locked() and solved_index.last_seq is not None:
+            return solved_index
+        async with _solved_index_refresh_lock:
+            if solved_index.needs_refresh():
+                crawl_version = solved_index.crawl_version()
+                while True:
+                    rows = await self._run(solved_index_batch_query(solved_index))
+                    # batches of a cold load would stall the event loop
+                    await run_in_threadpool(solved_index.apply, rows)
+                    if len(rows) < SOLVED_INDEX_BATCH_SIZE:
+                        break
+                solved_index.mark_refreshed(crawl_version)
+        return solved_index
+
+    async def get_user_solved_problems(self, aoj_userid: str) -> AbstractSet[int]:
+        return (await self._get_solved_index()).solved(aoj_userid)
+
+    async def refresh_solved_index(self) -> None:
+        await self._get_solved_index()
+
+    async def get_user_rank(
+        self, contest_type: int, aoj_userid: str
+    ) -> Optional[UserRank]:
+        return await self._run(user_rank_query(contest_type, aoj_userid))
+
+    async def get_data_versions(self) -> dict[str, DataVersion]:
+        return await self._execute(data_versions_plan())
+
+    async def get_likes_version(self, contest_type: int) -> int:
+        return await self._execute(contest_likes_version_plan(contest_type))
+
+    async def get_problem_likes_version(self, aoj_id: int) -> int:
+        return await self._execute(likes_version_plan([aoj_id]))
+
+    async def get_page_context(self, query: PageContextQuery) -> PageContext:
+        user_solved_problems: AbstractSet[int] = set()
+        if query.solved_problems_userid is not None:
+            user_solved_problems = await self.get_user_solved_problems(
+                query.solved_problems_userid
+            )
+        return await self._execute(page_context_plan(query, user_solved_problems))
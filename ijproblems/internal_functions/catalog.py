@@ -0,0 +1,193 @@
+import os
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import AbstractSet, Iterable, Optional
+
+from ijproblems.internal_functions.interface import Preference, ProblemInfo, RankingRow
+from ijproblems.internal_functions.invalidation import invalidation_bus
+from ijproblems.internal_functions.points import POINTS
+
+CATALOG_CHECK_INTERVAL_SECOND = float(
+    os.environ.get("CATALOG_CHECK_INTERVAL_SECOND", "10")
+)
+
+
+def problem_sort_key(problem: ProblemInfo) -> tuple[int, int, int]:
+    return (problem.level, -problem.year, problem.aoj_id)
+
+
+def _total_row(contest_type: int, problems: Iterable[ProblemInfo]) -> RankingRow:
+    level_counts: dict[int, int] = {}
+    for problem in problems:
+        level_counts[problem.level] = level_counts.get(problem.level, 0) + 1
+    counts = [count for _level, count in sorted(level_counts.items())]
+    total_point = sum(
+        point * count for point, count in zip(POINTS[contest_type], counts)
+    )
+
+    return RankingRow(
+        aoj_userid="TOTAL",
+        total_point=total_point,
+        total_solved=sum(counts),
+        solved_counts=counts,
+    )
+
+
+@dataclass(frozen=True)
+class ProblemCatalog:
+    """Immutable snapshot of the problems table.
+
+    Entries are shared between requests and must not be mutated;
+    copy them (e.g. with `dataclasses.replace`) before decorating.
+    """
+
+    version: int
+    problems: tuple[ProblemInfo, ...]
+    by_contest_type: dict[int, tuple[ProblemInfo, ...]]
+    by_level: dict[tuple[int, int], tuple[ProblemInfo, ...]]
+    by_aoj_id: dict[int, ProblemInfo]
+    # (contest_type, level or 0 for all, ja, en) -> problems in either language
+    by_language: dict[tuple[int, int, bool, bool], tuple[ProblemInfo, ...]]
+    total_rows: tuple[RankingRow, ...]
+
+    @classmethod
+    def build(cls, version: int, problems: Iterable[ProblemInfo]) -> "ProblemCatalog":
+        sorted_problems = tuple(sorted(problems, key=problem_sort_key))
+
+        by_contest_type: dict[int, list[ProblemInfo]] = {}
+        by_level: dict[tuple[int, int], list[ProblemInfo]] = {}
+        for problem in sorted_problems:
+            by_contest_type.setdefault(problem.contest_type, []).append(problem)
+            by_level.setdefault((problem.contest_type, problem.level), []).append(
+                problem
+            )
+
+        scopes = [
+            ((contest_type, 0), value)
+            for contest_type, value in by_contest_type.items()
+        ]
+        scopes += list(by_level.items())
+        by_language = {
+            (contest_type, level, ja, en): tuple(
+                problem
+                for problem in scope_problems
+                if (ja and problem.ja) or (en and problem.en)
+            )
+            for (contest_type, level), scope_problems in scopes
+            for ja in (False, True)
+            for en in (False, True)
+        }
+
+        return ProblemCatalog(
+            version=version,
+            problems=sorted_problems,
+            by_contest_type={
+                key: tuple(value) for key, value in by_contest_type.items()
+            },
+            by_level={key: tuple(value) for key, value in by_level.items()},
+            by_aoj_id={problem.aoj_id: problem for problem in sorted_problems},
+            by_language=by_language,
+            total_rows=tuple(
+                _total_row(contest_type, by_contest_type.get(contest_type, []))
+                for contest_type in range(len(POINTS))
+            ),
+        )
+
+    def select(self, contest_type: int, level_scope: int) -> tuple[ProblemInfo, ...]:
+        """Problems of `contest_type`, restricted to one level if `level_scope > 0`.
+
+        The result is already in display order.
+        """
+        if level_scope <= 0:
+            return self.by_contest_type.get(contest_type, ())
+        return self.by_level.get((contest_type, level_scope), ())
+
+    def total_row(self, contest_type: int) -> RankingRow:
+        """The TOTAL row of the ranking, i.e. the counts of all problems."""
+        return self.total_rows[contest_type]
+
+    def select_preferred(
+        self, preference: Preference, user_solved_problems: AbstractSet[int]
+    ) -> list[ProblemInfo]:
+        """Problems to list for `preference`, in display order.
+
+        That is the level scope in a preferred language, without the solved
+        ones if `hide_solved` is set. Filtering happens before like counts
+        are fetched, so they are only fetched for listed problems.
+        """
+        contest_type = preference.contest_type
+        level_scope = preference.level_scopes[contest_type]
+        problems = self.by_language.get(
+            (
+                contest_type,
+                max(level_scope, 0),
+                bool(preference.ja),
+                bool(preference.en),
+            ),
+            (),
+        )
+        if preference.hide_solved:
+            return [
+                problem
+                for problem in problems
+                if problem.aoj_id not in user_solved_problems
+            ]
+        return list(problems)
+
+
+def finish_problems(
+    problems: list[ProblemInfo], problem_counts: dict[int, tuple[int, int]]
+) -> list[ProblemInfo]:
+    """Attach the current like and solver counts."""
+    finished = []
+    for problem in problems:
+        likes, solvers = problem_counts.get(
+            problem.aoj_id, (problem.inherited_likes, 0)
+        )
+        finished.append(replace(problem, likes=likes, solvers=solvers))
+    return finished
+
+
+class CatalogCache:
+    """Per-worker holder of the current `ProblemCatalog`.
+
+    The database version is only consulted once per `check_interval_second`;
+    in between, the held snapshot is served as is. While the invalidation
+    listener is connected, it is consulted only after a change instead.
+    """
+
+    def __init__(self, check_interval_second: float) -> None:
+        self.check_interval_second = check_interval_second
+        self._lock = threading.Lock()
+        self._catalog: Optional[ProblemCatalog] = None
+        self._checked_at = 0.0
+
+    def current(self) -> Optional[ProblemCatalog]:
+        return self._catalog
+
+    def needs_check(self) -> bool:
+        if self._catalog is None:
+            return True
+        latest = invalidation_bus.version("catalog")
+        if latest is not None:
+            return self._catalog.version < latest
+        return time.monotonic() - self._checked_at >= self.check_interval_second
+
+    def mark_checked(self) -> None:
+        self._checked_at = time.monotonic()
+
+    def install(self, catalog: ProblemCatalog) -> None:
+        with self._lock:
+            current = self._catalog
+            # a slower concurrent loader must not roll back a newer snapshot
+            if current is None or current.version <= catalog.version:
+                self._catalog = catalog
+            self._checked_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._checked_at = 0.0
+
+
+catalog_cache = CatalogCache(CATALOG_CHECK_INTERVAL_SECOND)
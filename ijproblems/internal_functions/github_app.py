@@ -1,4 +1,47 @@
 import os
+from typing import Optional
+
+import httpx
 
 GITHUB_APP_CLIENT_ID = os.environ.get("GITHUB_APP_CLIENT_ID", "")
 GITHUB_APP_CLIENT_SECRET = os.environ.get("GITHUB_APP_CLIENT_SECRET", "")
+
+# overridable to log in against a stand-in server
+GITHUB_OAUTH_URL = os.environ.get(
+    "GITHUB_OAUTH_URL", "https://github.com/login/oauth/access_token"
+)
+GITHUB_USER_URL = os.environ.get("GITHUB_USER_URL", "https://api.github.com/user")
+GITHUB_CONNECT_TIMEOUT_SECOND = float(
+    os.environ.get("GITHUB_CONNECT_TIMEOUT_SECOND", "3")
+)
+GITHUB_READ_TIMEOUT_SECOND = float(os.environ.get("GITHUB_READ_TIMEOUT_SECOND", "10"))
+# requests to GitHub in flight per worker; more wait for a free connection up
+# to the connect timeout
+GITHUB_MAX_CONNECTIONS = int(os.environ.get("GITHUB_MAX_CONNECTIONS", "10"))
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_github_client() -> httpx.AsyncClient:
+    """HTTP client of this worker for GitHub, keeping connections alive."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                GITHUB_READ_TIMEOUT_SECOND,
+                connect=GITHUB_CONNECT_TIMEOUT_SECOND,
+                pool=GITHUB_CONNECT_TIMEOUT_SECOND,
+            ),
+            limits=httpx.Limits(
+                max_connections=GITHUB_MAX_CONNECTIONS,
+                max_keepalive_connections=GITHUB_MAX_CONNECTIONS,
+            ),
+        )
+    return _client
+
+
+async def close_github_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
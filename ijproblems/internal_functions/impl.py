@@ -1,71 +1,59 @@
-import dataclasses
-import json
-from dataclasses import asdict, dataclass
-from typing import Optional
+from typing import AbstractSet, Any, Optional, TypeVar
 
 import psycopg
 from fastapi import Request
-from psycopg.rows import class_row
+from psycopg.rows import dict_row
 
 from ijproblems.internal_functions.interface import (
-    Editorial,
+    DataVersion,
     GitHubLoginInfo,
     InterfaceInternalFunctions,
+    PageContext,
+    PageContextQuery,
     Preference,
     ProblemInfo,
     RankingRow,
+    UserRank,
+    session_github_login_info,
+)
+from ijproblems.internal_functions.plans import (
+    SOLVED_INDEX_BATCH_SIZE,
+    Plan,
+    Step,
+    catalog_plan,
+    contest_likes_version_plan,
+    data_versions_plan,
+    likes_plan,
+    likes_version_plan,
+    page_context_plan,
+    problems_plan,
+    set_like_plan,
+    solved_index_batch_query,
 )
 from ijproblems.internal_functions.points import POINTS
+from ijproblems.internal_functions.queries import (
+    Query,
+    global_ranking_query,
+    problem_query,
+    solved_user_count_query,
+    user_count_query,
+    user_local_ranking_query,
+    user_rank_query,
+)
+from ijproblems.internal_functions.solved_index import SolvedIndex, solved_index
 
-
-@dataclass
-class ProblemTableRow:
-    contest_type: int
-    name: str
-    level: int
-    aoj_id: int
-    org: str
-    year: int
-    en: int
-    ja: int
-    inherited_likes: int
-    likes_github: int
-
-    def __post_init__(self) -> None:
-        for field in dataclasses.fields(self):
-            value = getattr(self, field.name)
-            setattr(self, field.name, field.type(value))
-
-
-@dataclass
-class RankingRowFromDatabase:
-    aoj_userid: str
-    total: int
-    counts_per_levels: str
-
-    def to_ranking_row(self) -> RankingRow:
-        counts: list[int] = json.loads(self.counts_per_levels)
-        solved = sum(counts)
-
-        return RankingRow(
-            aoj_userid=self.aoj_userid,
-            total_point=self.total,
-            total_solved=solved,
-            solved_counts=counts,
-        )
+T = TypeVar("T")
 
 
-def parse_meta(problem_info: ProblemInfo) -> None:
-    meta = problem_info.meta
-    meta_obj = json.loads(meta)
+class PendingQuery:
+    """A query sent inside a pipeline whose result is parsed after the sync."""
 
-    for key in ("solved_teams", "participated_teams", "authors"):
-        if key in meta_obj:
-            setattr(problem_info, key, meta_obj[key])
+    def __init__(self, cursor: psycopg.Cursor[Any], query: Query[Any]) -> None:
+        self.cursor = cursor
+        self.query = query
 
-    problem_info.editorials = [
-        Editorial(**editorial) for editorial in meta_obj["editorials"]
-    ]
+    def result(self) -> Any:
+        return self.query.parse(self.cursor.fetchall())
 
 
 class ImplInternalFunctions(InterfaceInternalFunctions):
@@ -73,252 +61,121 @@ class ImplInternalFunctions(InterfaceInternalFunctions):
     def __init__(self, conn: psycopg.Connection) -> None:
         self.conn = conn
 
+    def _run(self, query: Query[T]) -> T:
+        if query.commit:
+            return self._run_pipeline({"result": query})["result"]
+        with self.conn.cursor(row_factory=dict_row) as cursor:
+            return query.parse(cursor.execute(query.sql, query.params).fetchall())
+
+    def _send(self, query: Query[Any]) -> PendingQuery:
+        cursor = self.conn.cursor(row_factory=dict_row)
+        cursor.execute(query.sql, query.params)
+        return PendingQuery(cursor, query)
+
+    def _run_pipeline(self, queries: dict[str, Query[Any]]) -> dict[str, Any]:
+        if not queries:
+            return {}
+        # the statements, and the commit of writing ones, share one round trip
+        with self.conn.pipeline():
+            pending = {key: self._send(value) for key, value in queries.items()}
+            if any(value.commit for value in queries.values()):
+                self.conn.commit()
+        return {key: value.result() for key, value in pending.items()}
+
+    def _execute(self, plan: Plan[T]) -> T:
+        result: Any = None
+        try:
+            while True:
+                step: Step = plan.send(result)
+                if isinstance(step, dict):
+                    result = self._run_pipeline(step)
+                else:
+                    result = self._run(step)
+        except StopIteration as stop:
+            return stop.value
+
     def get_points(self, contest_type: int) -> list[int]:
         return POINTS[contest_type]
 
     def get_problems(
-        self, preference: Preference, user_solved_problems: set[int]
+        self, preference: Preference, user_solved_problems: AbstractSet[int]
     ) -> list[ProblemInfo]:
-        # NOTE: meta info is ignored
-        with self.conn.cursor(row_factory=class_row(ProblemTableRow)) as cursor:
-            problems_row = cursor.execute(
-                "SELECT P.contest_type AS contest_type,"
-                "P.name AS name,"
-                "P.level AS level,"
-                "P.problem_id AS aoj_id,"
-                "P.org AS org,"
-                "P.year AS year,"
-                "P.en AS en,"
-                "P.ja AS ja,"
-                "P.inherited_likes AS inherited_likes,"
-                "COUNT(L.github_id) AS likes_github "
-                "FROM problems AS P "
-                "LEFT JOIN likes AS L ON P.problem_id = L.problem_id "
-                "WHERE P.contest_type=%(contest_type)s "
-                "AND (%(level_scope)s <= 0 OR P.level = %(level_scope)s)"
-                "GROUP BY P.problem_id",
-                {
-                    "contest_type": preference.contest_type,
-                    "level_scope": preference.level_scopes[preference.contest_type],
-                },
-            ).fetchall()
-
-        def to_problem_info(row: ProblemTableRow) -> ProblemInfo:
-            likes = row.likes_github + row.inherited_likes
-            obj = asdict(row)
-            del obj["likes_github"]
-            return ProblemInfo(
-                **obj,
-                likes=likes,
-            )
-
-        return sorted(
-            [
-                to_problem_info(problem)
-                for problem in problems_row
-                if ((preference.ja and problem.ja) or (preference.en and problem.en))
-                and not (
-                    preference.hide_solved and problem.aoj_id in user_solved_problems
-                )
-            ],
-            key=lambda problem: (problem.level, -problem.year, problem.aoj_id),
-        )
+        return self._execute(problems_plan(preference, user_solved_problems))
 
     def get_problem(self, aoj_id: int) -> Optional[ProblemInfo]:
-        with self.conn.cursor(row_factory=class_row(ProblemInfo)) as cursor:
-            res = cursor.execute(
-                "SELECT contest_type,"
-                "name,"
-                "level,"
-                "P.problem_id AS aoj_id,"
-                "org,"
-                "year,"
-                "used_in,"
-                "slot,"
-                "en,"
-                "ja,"
-                "inherited_likes,"
-                "meta,"
-                "COUNT(L.github_id) AS likes "
-                "FROM problems AS P "
-                "LEFT JOIN likes AS L ON P.problem_id = L.problem_id "
-                "WHERE P.problem_id=%(problem_id)s "
-                "GROUP BY P.problem_id",
-                {"problem_id": aoj_id},
-            ).fetchone()
-        if res is None:
-            return None
-        parse_meta(res)
-        res.likes += res.inherited_likes
-        return res
+        return self._run(problem_query(aoj_id))
 
     def get_solved_user_count(self, aoj_id: int) -> int:
-        res = self.conn.execute(
-            "SELECT COUNT(*) AS count "
-            "FROM aoj_acceptances "
-            "WHERE problem_id=%(problem_id)s ",
-            {
-                "problem_id": aoj_id,
-            },
-        ).fetchone()
-
-        if res is None:
-            raise Exception("counting failed")
-
-        return res[0]
+        return self._run(solved_user_count_query(aoj_id))
 
     def get_problems_total_row(self, contest_type: int) -> RankingRow:
-        level_counts = self.conn.execute(
-            "SELECT level, COUNT(*) AS count "
-            "FROM problems "
-            "WHERE contest_type=%(contest_type)s "
-            "GROUP BY level ",
-            {
-                "contest_type": contest_type,
-            },
-        )
-        counts = [count for _level, count in sorted(level_counts)]
-        total_point = sum(
-            point * count for point, count in zip(POINTS[contest_type], counts)
-        )
-
-        return RankingRow(
-            aoj_userid="TOTAL",
-            total_point=total_point,
-            total_solved=sum(counts),
-            solved_counts=counts,
-        )
+        return self._execute(catalog_plan()).total_row(contest_type)
 
     def get_global_ranking(
         self, contest_type: int, begin: int, end: int
     ) -> list[RankingRow]:
-        with self.conn.cursor(row_factory=class_row(RankingRowFromDatabase)) as cursor:
-            res = cursor.execute(
-                "SELECT aoj_userid, total, counts_per_levels "
-                "FROM user_points "
-                "WHERE contest_type=%(contest_type)s "
-                "ORDER BY total DESC LIMIT %(limit)s OFFSET %(offset)s",
-                {
-                    "contest_type": contest_type,
-                    "limit": end - begin + 1,
-                    "offset": begin - 1,
-                },
-            ).fetchall()
-
-        return [row.to_ranking_row() for row in res]
+        return self._run(global_ranking_query(contest_type, begin, end))
 
     def get_user_count(self, contest_type: int) -> int:
-        res = self.conn.execute(
-            "SELECT COUNT(*) AS count "
-            "FROM user_points "
-            "WHERE contest_type=%(contest_type)s ",
-            {
-                "contest_type": contest_type,
-            },
-        ).fetchone()
-        if res is None:
-            raise Exception("database error")
-        (count,) = res
-        return count
+        return self._run(user_count_query(contest_type))
 
     def get_github_login_info(self, request: Request) -> Optional[GitHubLoginInfo]:
-        session = request.session
-        if "github_id" in session and "github_login" in session:
-            return GitHubLoginInfo(
-                github_id=session["github_id"], login=session["github_login"]
-            )
-        else:
-            return None
+        return session_github_login_info(request)
 
     def get_likes(self, github_id: int) -> set[int]:
-        res = self.conn.execute(
-            "SELECT problem_id " "FROM likes " "WHERE github_id=%(github_id)s ",
-            {
-                "github_id": github_id,
-            },
-        ).fetchall()
-        return set(entry for entry, in res)
+        return self._execute(likes_plan(github_id))
 
     def set_like(self, github_id: int, aoj_id: int, value: int) -> int:
-        inherited_likes_res = self.conn.execute(
-            "SELECT inherited_likes FROM problems WHERE problem_id=%(problem_id)s",
-            {"problem_id": aoj_id},
-        ).fetchone()
-
-        if inherited_likes_res is None:
-            raise Exception(f"invalid aoj_id: {aoj_id}")
-
-        (inherited_likes,) = inherited_likes_res
-
-        if value == 0:
-            self.conn.execute(
-                "DELETE FROM likes "
-                "WHERE github_id=%(github_id)s AND problem_id=%(problem_id)s ",
-                {
-                    "github_id": github_id,
-                    "problem_id": aoj_id,
-                },
-            )
-        elif value == 1:
-            self.conn.execute(
-                "INSERT INTO likes (github_id, problem_id) "
-                "VALUES (%(github_id)s, %(problem_id)s) "
-                "ON CONFLICT (github_id, problem_id) DO NOTHING",
-                {
-                    "github_id": github_id,
-                    "problem_id": aoj_id,
-                },
-            )
-        else:
-            raise NotImplementedError
-
-        self.conn.commit()
-        likes_res = self.conn.execute(
-            "SELECT COUNT(*) AS count " "FROM likes WHERE problem_id=%(problem_id)s",
-            {
-                "problem_id": aoj_id,
-            },
-        ).fetchone()
-
-        if likes_res is None:
-            raise Exception("database error")
-
-        (likes,) = likes_res
-
-        return inherited_likes + likes
+        return self._execute(set_like_plan(github_id, aoj_id, value))
 
     def get_user_local_ranking(
         self, contest_type: int, aoj_userids: list[str]
     ) -> list[RankingRow]:
-        with self.conn.cursor(row_factory=class_row(RankingRowFromDatabase)) as cursor:
-            ranking_rows = []
-            for aoj_userid in aoj_userids:
-                res = cursor.execute(
-                    "SELECT aoj_userid, total, counts_per_levels "
-                    "FROM user_points "
-                    "WHERE contest_type=%(contest_type)s "
-                    "AND aoj_userid=%(aoj_userid)s",
-                    {"contest_type": contest_type, "aoj_userid": aoj_userid.lower()},
-                ).fetchone()
-
-                if res is None:
-                    ranking_rows.append(
-                        RankingRow(
-                            aoj_userid=aoj_userid.lower(),
-                            total_point=0,
-                            total_solved=0,
-                            solved_counts=[0] * len(POINTS[contest_type]),
-                        )
-                    )
-                else:
-                    ranking_rows.append(res.to_ranking_row())
-
-            return sorted(ranking_rows, key=lambda row: -row.total_point)
-
-    def get_user_solved_problems(self, aoj_userid: str) -> set[int]:
-        res = self.conn.execute(
-            "SELECT problem_id FROM aoj_acceptances " "WHERE aoj_userid=%(aoj_userid)s",
-            {"aoj_userid": aoj_userid.lower()},
-        ).fetchall()
-
-        return set(entry for entry, in res)
+        return self._run(user_local_ranking_query(contest_type, aoj_userids))
+
+    def _get_solved_index(self) -> SolvedIndex:
+        if not solved_index.needs_refresh():
+            return solved_index
+
+        # a loaded index is served as it is while another thread tails rows
+        blocking = solved_index.last_seq is None
+        if not solved_index.refresh_lock.acquire(blocking=blocking):
+            return solved_index
+        try:
+            if solved_index.needs_refresh():
+                crawl_version = solved_index.crawl_version()
+                while True:
+                    rows = self._run(solved_index_batch_query(solved_index))
+                    solved_index.apply(rows)
+                    if len(rows) < SOLVED_INDEX_BATCH_SIZE:
+                        break
+                solved_index.mark_refreshed(crawl_version)
+        finally:
+            solved_index.refresh_lock.release()
+        return solved_index
+
+    def get_user_solved_problems(self, aoj_userid: str) -> AbstractSet[int]:
+        return self._get_solved_index().solved(aoj_userid)
+
+    def refresh_solved_index(self) -> None:
+        self._get_solved_index()
+
+    def get_user_rank(self, contest_type: int, aoj_userid: str) -> Optional[UserRank]:
+        return self._run(user_rank_query(contest_type, aoj_userid))
+
+    def get_data_versions(self) -> dict[str, DataVersion]:
+        return self._execute(data_versions_plan())
+
+    def get_likes_version(self, contest_type: int) -> int:
+        return self._execute(contest_likes_version_plan(contest_type))
+
+    def get_problem_likes_version(self, aoj_id: int) -> int:
+        return self._execute(likes_version_plan([aoj_id]))
+
+    def get_page_context(self, query: PageContextQuery) -> PageContext:
+        user_solved_problems: AbstractSet[int] = set()
+        if query.solved_problems_userid is not None:
+            user_solved_problems = self.get_user_solved_problems(
+                query.solved_problems_userid
+            )
+        return self._execute(page_context_plan(query, user_solved_problems))
@@ -0,0 +1,105 @@
+from typing import AbstractSet, Optional
+
+from fastapi import Request
+
+from ijproblems.internal_functions.interface import (
+    AsyncInterfaceInternalFunctions,
+    DataVersion,
+    GitHubLoginInfo,
+    PageContext,
+    PageContextQuery,
+    Preference,
+    ProblemInfo,
+    RankingRow,
+    UserRank,
+)
+from ijproblems.internal_functions.timing import timed_call
+
+
+class InstrumentedInternalFunctions(AsyncInterfaceInternalFunctions):
+    """Adds every call to the current request's timings, per method."""
+
+    def __init__(self, functions: AsyncInterfaceInternalFunctions) -> None:
+        self.functions = functions
+
+    def get_points(self, contest_type: int) -> list[int]:
+        with timed_call("get_points"):
+            return self.functions.get_points(contest_type)
+
+    async def get_problems(
+        self, preference: Preference, user_solved_problems: AbstractSet[int]
+    ) -> list[ProblemInfo]:
+        with timed_call("get_problems"):
+            return await self.functions.get_problems(preference, user_solved_problems)
+
+    async def get_problem(self, aoj_id: int) -> Optional[ProblemInfo]:
+        with timed_call("get_problem"):
+            return await self.functions.get_problem(aoj_id)
+
+    async def get_solved_user_count(self, aoj_id: int) -> int:
+        with timed_call("get_solved_user_count"):
+            return await self.functions.get_solved_user_count(aoj_id)
+
+    async def get_problems_total_row(self, contest_type: int) -> RankingRow:
+        with timed_call("get_problems_total_row"):
+            return await self.functions.get_problems_total_row(contest_type)
+
+    async def get_global_ranking(
+        self, contest_type: int, begin: int, end: int
+    ) -> list[RankingRow]:
+        with timed_call("get_global_ranking"):
+            return await self.functions.get_global_ranking(contest_type, begin, end)
+
+    async def get_user_count(self, contest_type: int) -> int:
+        with timed_call("get_user_count"):
+            return await self.functions.get_user_count(contest_type)
+
+    def get_github_login_info(self, request: Request) -> Optional[GitHubLoginInfo]:
+        with timed_call("get_github_login_info"):
+            return self.functions.get_github_login_info(request)
+
+    async def get_likes(self, github_id: int) -> set[int]:
+        with timed_call("get_likes"):
+            return await self.functions.get_likes(github_id)
+
+    async def set_like(self, github_id: int, aoj_id: int, value: int) -> int:
+        with timed_call("set_like"):
+            return await self.functions.set_like(github_id, aoj_id, value)
+
+    async def get_user_local_ranking(
+        self, contest_type: int, aoj_userids: list[str]
+    ) -> list[RankingRow]:
+        with timed_call("get_user_local_ranking"):
+            return await self.functions.get_user_local_ranking(
+                contest_type, aoj_userids
+            )
+
+    async def get_user_solved_problems(self, aoj_userid: str) -> AbstractSet[int]:
+        with timed_call("get_user_solved_problems"):
+            return await self.functions.get_user_solved_problems(aoj_userid)
+
+    async def refresh_solved_index(self) -> None:
+        with timed_call("refresh_solved_index"):
+            await self.functions.refresh_solved_index()
+
+    async def get_user_rank(
+        self, contest_type: int, aoj_userid: str
+    ) -> Optional[UserRank]:
+        with timed_call("get_user_rank"):
+            return await self.functions.get_user_rank(contest_type, aoj_userid)
+
+    async def get_data_versions(self) -> dict[str, DataVersion]:
+        with timed_call("get_data_versions"):
+            return await self.functions.get_data_versions()
+
+    async def get_likes_version(self, contest_type: int) -> int:
+        with timed_call("get_likes_version"):
+            return await self.functions.get_likes_version(contest_type)
+
+    async def get_problem_likes_version(self, aoj_id: int) -> int:
+        with timed_call("get_problem_likes_version"):
+            return await self.functions.get_problem_likes_version(aoj_id)
+
+    async def get_page_context(self, query: PageContextQuery) -> PageContext:
+        with timed_call("get_page_context"):
+            return await self.functions.get_page_context(query)
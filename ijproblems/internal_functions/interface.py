@@ -1,7 +1,8 @@
 import abc
 from abc import abstractmethod
 from dataclasses import dataclass, field
-from typing import Optional
+from datetime import datetime
+from typing import AbstractSet, Optional
 from urllib.parse import unquote
 
 from fastapi import Request
@@ -54,6 +55,8 @@ class ProblemInfoBase:
 @dataclass
 class ProblemInfo(ProblemInfoBase):
     likes: int = 0
+    # users who solved it on AOJ
+    solvers: int = 0
     meta: str = ""
 
 
@@ -63,6 +66,30 @@ class RankingRow:
     total_point: int
     total_solved: int
     solved_counts: list[int]
+    # competition rank in the global ranking; None outside of it
+    rank: Optional[int] = None
+
+
+@dataclass
+class UserRank:
+    aoj_userid: str
+    rank: int
+    # 1-based row in the global ranking, which determines the page
+    position: int
+
+
+@dataclass(frozen=True)
+class DataVersion:
+    """Version counter of a data set, bumped whenever the set changes.
+
+    Known names are "catalog" (problems), "crawl" (acceptances and points)
+    and "likes" (rebuilds of the like counters). Single likes are versioned
+    per problem instead, see `get_likes_version`.
+    """
+
+    version: int
+    # naive UTC
+    updated_at: datetime
 
 
 @dataclass
@@ -71,6 +98,49 @@ class GitHubLoginInfo:
     login: str
 
 
+def session_github_login_info(request: Request) -> Optional[GitHubLoginInfo]:
+    """The login stored in the session by the GitHub callback, if any."""
+    session = request.session
+    if "github_id" in session and "github_login" in session:
+        return GitHubLoginInfo(
+            github_id=session["github_id"], login=session["github_login"]
+        )
+    return None
+
+
+@dataclass
+class PageContextQuery:
+    """What a page needs from the database. Unset parts are not fetched.
+
+    `contest_type` applies to `total_row`, `local_ranking_userids`,
+    `global_ranking_range` and `user_count`. The problem list is filtered
+    with the solved problems of `solved_problems_userid`.
+    """
+
+    contest_type: int = 0
+    total_row: bool = False
+    local_ranking_userids: Optional[list[str]] = None
+    solved_problems_userid: Optional[str] = None
+    problems_preference: Optional[Preference] = None
+    likes_github_id: Optional[int] = None
+    global_ranking_range: Optional[tuple[int, int]] = None
+    user_count: bool = False
+    problem_aoj_id: Optional[int] = None
+
+
+@dataclass
+class PageContext:
+    total_row: Optional[RankingRow] = None
+    local_ranking: list[RankingRow] = field(default_factory=list)
+    user_solved_problems: AbstractSet[int] = field(default_factory=set)
+    problems: list[ProblemInfo] = field(default_factory=list)
+    user_likes: set[int] = field(default_factory=set)
+    global_ranking: list[RankingRow] = field(default_factory=list)
+    user_count: int = 0
+    problem: Optional[ProblemInfo] = None
+    problem_solved_user_count: int = 0
+
+
 class InterfaceInternalFunctions(metaclass=abc.ABCMeta):
     @abstractmethod
     def get_points(self, contest_type: int) -> list[int]:
@@ -78,7 +148,7 @@ class InterfaceInternalFunctions(metaclass=abc.ABCMeta):
 
     @abstractmethod
     def get_problems(
-        self, preference: Preference, user_solved_problems: set[int]
+        self, preference: Preference, user_solved_problems: AbstractSet[int]
     ) -> list[ProblemInfo]:
         raise NotImplementedError
 
@@ -123,5 +193,149 @@ class InterfaceInternalFunctions(metaclass=abc.ABCMeta):
         raise NotImplementedError
 
     @abstractmethod
-    def get_user_solved_problems(self, aoj_userid: str) -> set[int]:
+    def get_user_solved_problems(self, aoj_userid: str) -> AbstractSet[int]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def refresh_solved_index(self) -> None:
+        """Bring the index behind `get_user_solved_problems` up to date."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_user_rank(self, contest_type: int, aoj_userid: str) -> Optional[UserRank]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_data_versions(self) -> dict[str, DataVersion]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_likes_version(self, contest_type: int) -> int:
+        """A version that grows with every like of a problem of `contest_type`."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_problem_likes_version(self, aoj_id: int) -> int:
+        """A version that grows with every like of the problem `aoj_id`."""
+        raise NotImplementedError
+
+    def get_page_context(self, query: PageContextQuery) -> PageContext:
+        """Fetch everything `query` asks for.
+
+        This default issues one call per part; implementations backed by a
+        database should override it to batch the round trips.
+        """
+        context = PageContext()
+        if query.total_row:
+            context.total_row = self.get_problems_total_row(query.contest_type)
+        if query.local_ranking_userids is not None:
+            context.local_ranking = self.get_user_local_ranking(
+                query.contest_type, query.local_ranking_userids
+            )
+        if query.solved_problems_userid is not None:
+            context.user_solved_problems = self.get_user_solved_problems(
+                query.solved_problems_userid
+            )
+        if query.problems_preference is not None:
+            context.problems = self.get_problems(
+                query.problems_preference, context.user_solved_problems
+            )
+        if query.likes_github_id is not None:
+            context.user_likes = self.get_likes(query.likes_github_id)
+        if query.global_ranking_range is not None:
+            begin, end = query.global_ranking_range
+            context.global_ranking = self.get_global_ranking(
+                query.contest_type, begin, end
+            )
+        if query.user_count:
+            context.user_count = self.get_user_count(query.contest_type)
+        if query.problem_aoj_id is not None:
+            context.problem = self.get_problem(query.problem_aoj_id)
+            context.problem_solved_user_count = self.get_solved_user_count(
+                query.problem_aoj_id
+            )
+        return context
+
+
+class AsyncInterfaceInternalFunctions(metaclass=abc.ABCMeta):
+    """Awaitable counterpart of `InterfaceInternalFunctions` used by routes."""
+
+    @abstractmethod
+    def get_points(self, contest_type: int) -> list[int]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_problems(
+        self, preference: Preference, user_solved_problems: AbstractSet[int]
+    ) -> list[ProblemInfo]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_problem(self, aoj_id: int) -> Optional[ProblemInfo]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_solved_user_count(self, aoj_id: int) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_problems_total_row(self, contest_type: int) -> RankingRow:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_global_ranking(
+        self, contest_type: int, begin: int, end: int
+    ) -> list[RankingRow]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_user_count(self, contest_type: int) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_github_login_info(self, request: Request) -> Optional[GitHubLoginInfo]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_likes(self, github_id: int) -> set[int]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set_like(self, github_id: int, aoj_id: int, value: int) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_user_local_ranking(
+        self, contest_type: int, aoj_userids: list[str]
+    ) -> list[RankingRow]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_user_solved_problems(self, aoj_userid: str) -> AbstractSet[int]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def refresh_solved_index(self) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_user_rank(
+        self, contest_type: int, aoj_userid: str
+    ) -> Optional[UserRank]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_data_versions(self) -> dict[str, DataVersion]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_likes_version(self, contest_type: int) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_problem_likes_version(self, aoj_id: int) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_page_context(self, query: PageContextQuery) -> PageContext:
         raise NotImplementedError
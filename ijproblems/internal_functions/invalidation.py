@@ -0,0 +1,165 @@
+"""Cross-worker invalidation of in-process caches.
+
+Every data_versions bump is announced with NOTIFY on `INVALIDATION_CHANNEL`,
+in the transaction that makes the change. The payload is a JSON object with
+the name of the bumped row ("data"), its new "version" and "updated_at", and
+optionally what exactly changed, such as the recomputed "users" of a crawl.
+A like toggle bumps no row; its event has the "problem_id", the problem's
+"like_version" and the "github_id" instead of "version" and "updated_at".
+
+Each worker keeps one listener connection. While it is connected, caches
+follow the events instead of polling; events sent while it is not are lost,
+so the caches start over on every reconnect.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+import psycopg
+
+from ijproblems.internal_functions.interface import DataVersion
+
+logger = logging.getLogger(__name__)
+
+# must match ijproblems_admin.database
+INVALIDATION_CHANNEL = "invalidation"
+# "0" makes every worker poll the database as without the bus
+INVALIDATION_LISTEN = os.environ.get("INVALIDATION_LISTEN", "1") != "0"
+INVALIDATION_RETRY_SECOND = 5.0
+
+Event = dict[str, Any]
+
+
+class InvalidationBus:
+    """Dispatches invalidation events to the caches of this worker.
+
+    `versions` mirrors the data_versions table while the listener is
+    connected and is None otherwise.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._versions: Optional[dict[str, DataVersion]] = None
+        self._handlers: dict[str, list[Callable[[Event], None]]] = {}
+        self._resets: list[Callable[[bool], None]] = []
+
+    def subscribe(self, data: str, handler: Callable[[Event], None]) -> None:
+        """Run `handler` on every event about the data_versions row `data`."""
+        self._handlers.setdefault(data, []).append(handler)
+
+    def on_reset(self, reset: Callable[[bool], None]) -> None:
+        """Run `reset` with the new state whenever the listener (dis)connects."""
+        self._resets.append(reset)
+
+    @property
+    def connected(self) -> bool:
+        return self._versions is not None
+
+    def versions(self) -> Optional[dict[str, DataVersion]]:
+        versions = self._versions
+        return dict(versions) if versions is not None else None
+
+    def version(self, data: str) -> Optional[int]:
+        versions = self._versions
+        if versions is None or data not in versions:
+            return None
+        return versions[data].version
+
+    def connect(self, versions: dict[str, DataVersion]) -> None:
+        with self._lock:
+            self._versions = dict(versions)
+        for reset in self._resets:
+            reset(True)
+
+    def disconnect(self) -> None:
+        with self._lock:
+            self._versions = None
+        for reset in self._resets:
+            reset(False)
+
+    def dispatch(self, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+            data = event["data"]
+            version: Optional[DataVersion] = None
+            if "version" in event:
+                version = DataVersion(
+                    version=event["version"],
+                    updated_at=datetime.fromisoformat(event["updated_at"]),
+                )
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"malformed invalidation event: {payload!r}")
+            return
+        with self._lock:
+            versions = self._versions
+            if versions is not None and version is not None:
+                current = versions.get(data)
+                if current is None or current.version < version.version:
+                    # replaced, not mutated, for readers in other threads
+                    self._versions = {**versions, data: version}
+        for handler in self._handlers.get(data, []):
+            # one failing cache must not keep the others from the event
+            try:
+                handler(event)
+            except Exception:
+                logger.exception(f"invalidation handler failed on {payload!r}")
+
+
+invalidation_bus = InvalidationBus()
+
+
+class InvalidationListener:
+    """Keeps `bus` listening to `INVALIDATION_CHANNEL`, reconnecting on errors."""
+
+    def __init__(self, conninfo: str, bus: InvalidationBus) -> None:
+        self.conninfo = conninfo
+        self.bus = bus
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except psycopg.Error as e:
+                logger.warning(f"invalidation listener disconnected: {e}")
+            except Exception:
+                logger.exception("invalidation listener failed")
+            finally:
+                self.bus.disconnect()
+            await asyncio.sleep(INVALIDATION_RETRY_SECOND)
+
+    async def _listen(self) -> None:
+        async with await psycopg.AsyncConnection.connect(
+            self.conninfo, autocommit=True
+        ) as conn:
+            await conn.execute(f"LISTEN {INVALIDATION_CHANNEL}")
+            # read after LISTEN, so that no change falls in between
+            cursor = await conn.execute(
+                "SELECT name, version, updated_at FROM data_versions"
+            )
+            self.bus.connect(
+                {
+                    name: DataVersion(version=version, updated_at=updated_at)
+                    for name, version, updated_at in await cursor.fetchall()
+                }
+            )
+            async for notify in conn.notifies():
+                self.bus.dispatch(notify.payload)
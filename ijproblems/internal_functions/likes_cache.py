@@ -0,0 +1,158 @@
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from ijproblems.internal_functions.invalidation import Event, invalidation_bus
+
+# users whose liked problems a worker keeps; 0 disables the cache
+LIKES_CACHE_MAX_USERS = int(os.environ.get("LIKES_CACHE_MAX_USERS", "10000"))
+
+
+class LikesCache:
+    """Per-worker LRU cache of the problems each GitHub user likes.
+
+    `set_like` of this worker updates entries in place; likes set through
+    other workers arrive as "likes" events and drop the user's entry.
+    Entries are only kept while the invalidation listener is connected.
+    """
+
+    def __init__(self, max_users: int) -> None:
+        self.max_users = max_users
+        # tells notifications of this worker's own writes apart
+        self.origin = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._likes: OrderedDict[int, frozenset[int]] = OrderedDict()
+        self._generation = 0
+        self._active = False
+
+    def get(self, github_id: int) -> Optional[frozenset[int]]:
+        with self._lock:
+            likes = self._likes.get(github_id)
+            if likes is not None:
+                self._likes.move_to_end(github_id)
+            return likes
+
+    def generation(self) -> int:
+        """To be read before loading likes that are then passed to `put`."""
+        return self._generation
+
+    def put(self, github_id: int, likes: set[int], generation: int) -> None:
+        with self._lock:
+            # an invalidation since the load began may be newer than `likes`
+            if not self._active or generation != self._generation:
+                return
+            self._likes[github_id] = frozenset(likes)
+            self._likes.move_to_end(github_id)
+            while len(self._likes) > self.max_users:
+                self._likes.popitem(last=False)
+
+    def update(self, github_id: int, aoj_id: int, value: int) -> None:
+        """Apply a committed like toggle of this worker."""
+        with self._lock:
+            self._generation += 1
+            likes = self._likes.get(github_id)
+            if likes is None:
+                return
+            if value:
+                self._likes[github_id] = likes | {aoj_id}
+            else:
+                self._likes[github_id] = likes - {aoj_id}
+
+    def invalidate(self, github_id: int) -> None:
+        with self._lock:
+            self._generation += 1
+            self._likes.pop(github_id, None)
+
+    def notified(self, event: Event) -> None:
+        # events without a user, such as counter rebuilds, change no like sets
+        github_id = event.get("github_id")
+        if isinstance(github_id, int) and event.get("origin") != self.origin:
+            self.invalidate(github_id)
+
+    def set_active(self, active: bool) -> None:
+        with self._lock:
+            self._generation += 1
+            self._likes.clear()
+            self._active = active
+
+
+class LikeVersions:
+    """Per-worker mirror of the like version of every problem.
+
+    Filled by one load and then kept up by "likes" events. Versions only
+    grow, so a load and events are merged by taking the larger one, in
+    whatever order they arrive. Events without a problem, such as counter
+    rebuilds, and catalog changes drop the mirror for the next load.
+    Only kept while the invalidation listener is connected.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._versions: dict[int, int] = {}
+        self._generation = 0
+        self._loaded = False
+        self._active = False
+
+    def generation(self) -> int:
+        """To be read before loading versions that are then passed to `load`."""
+        return self._generation
+
+    @property
+    def active(self) -> bool:
+        return self._active
+
+    def load(self, versions: dict[int, int], generation: int) -> None:
+        with self._lock:
+            if not self._active or generation != self._generation:
+                return
+            for aoj_id, version in versions.items():
+                self._raise(aoj_id, version)
+            self._loaded = True
+
+    def update(self, aoj_id: int, version: int) -> None:
+        with self._lock:
+            self._raise(aoj_id, version)
+
+    def _raise(self, aoj_id: int, version: int) -> None:
+        if version > self._versions.get(aoj_id, 0):
+            self._versions[aoj_id] = version
+
+    def total(self, aoj_ids: Iterable[int]) -> Optional[int]:
+        """Sum of the versions of the problems; None if not loaded."""
+        with self._lock:
+            if not self._active or not self._loaded:
+                return None
+            return sum(self._versions.get(aoj_id, 0) for aoj_id in aoj_ids)
+
+    def notified(self, event: Event) -> None:
+        aoj_id = event.get("problem_id")
+        version = event.get("like_version")
+        if isinstance(aoj_id, int) and isinstance(version, int):
+            self.update(aoj_id, version)
+        else:
+            self.drop()
+
+    def drop(self, _event: Optional[Event] = None) -> None:
+        with self._lock:
+            self._generation += 1
+            self._versions.clear()
+            self._loaded = False
+
+    def set_active(self, active: bool) -> None:
+        with self._lock:
+            self._generation += 1
+            self._versions.clear()
+            self._loaded = False
+            self._active = active
+
+
+likes_cache = LikesCache(LIKES_CACHE_MAX_USERS)
+invalidation_bus.subscribe("likes", likes_cache.notified)
+invalidation_bus.on_reset(likes_cache.set_active)
+
+like_versions = LikeVersions()
+invalidation_bus.subscribe("likes", like_versions.notified)
+invalidation_bus.subscribe("catalog", like_versions.drop)
+invalidation_bus.on_reset(like_versions.set_active)
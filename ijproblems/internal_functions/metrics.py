@@ -0,0 +1,203 @@
+"""Process-local metrics in the Prometheus text format.
+
+Every thread writes to its own shard, so observing takes no lock; a scrape
+adds the shards up. The shard of a thread that ends is folded into a retired
+total. Each worker process reports its own values.
+"""
+
+import threading
+import weakref
+from bisect import bisect_left
+from typing import Callable, Generic, Iterable, Optional, TypeVar, Union
+
+S = TypeVar("S")
+
+Labels = tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Owner:
+    """Kept only in a thread's local storage, so it goes when the thread ends."""
+
+
+class _Shards(Generic[S]):
+    def __init__(self, factory: Callable[[], S], add: Callable[[S, S], None]) -> None:
+        self._factory = factory
+        # adds the second shard into the first
+        self._add = add
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: list[S] = []
+        self._retired = factory()
+
+    def mine(self) -> S:
+        shard: Optional[S] = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._factory()
+            with self._lock:
+                self._shards.append(shard)
+            owner = _Owner()
+            self._local.shard = shard
+            self._local.owner = owner
+            weakref.finalize(owner, self._retire, shard)
+        return shard
+
+    def _retire(self, shard: S) -> None:
+        with self._lock:
+            self._shards = [other for other in self._shards if other is not shard]
+            self._add(self._retired, shard)
+
+    def total(self) -> S:
+        # under the lock, so that no shard is counted both live and retired
+        with self._lock:
+            total = self._factory()
+            self._add(total, self._retired)
+            for shard in self._shards:
+                self._add(total, shard)
+            return total
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value))
+
+
+def format_family(
+    name: str,
+    description: str,
+    kind: str,
+    samples: Iterable[tuple[str, Labels, Labels, float]],
+) -> str:
+    """A metric family; samples are (suffix, label names, label values, value)."""
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+    for suffix, label_names, label_values, value in samples:
+        labels = _format_labels(label_names, label_values)
+        lines.append(f"{name}{suffix}{labels} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+class Counter:
+    def __init__(self, name: str, description: str, label_names: Labels = ()) -> None:
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self._shards: _Shards[dict[Labels, float]] = _Shards(dict, self._add)
+        _registry.append(self)
+
+    @staticmethod
+    def _add(total: dict[Labels, float], shard: dict[Labels, float]) -> None:
+        # a C-level copy, so it is not disturbed by the owning thread
+        for labels, value in shard.copy().items():
+            total[labels] = total.get(labels, 0.0) + value
+
+    def inc(self, labels: Labels = (), amount: float = 1.0) -> None:
+        shard = self._shards.mine()
+        shard[labels] = shard.get(labels, 0.0) + amount
+
+    def collect(self) -> dict[Labels, float]:
+        return self._shards.total()
+
+    def render(self) -> str:
+        return format_family(
+            self.name,
+            self.description,
+            "counter",
+            (
+                ("", self.label_names, labels, value)
+                for labels, value in sorted(self.collect().items())
+            ),
+        )
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names: Labels = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+        # per labels: a count for each bucket and +Inf, then the sum
+        self._shards: _Shards[dict[Labels, list[float]]] = _Shards(dict, self._add)
+        _registry.append(self)
+
+    @staticmethod
+    def _add(
+        total: dict[Labels, list[float]], shard: dict[Labels, list[float]]
+    ) -> None:
+        for labels, counts in shard.copy().items():
+            summed = total.setdefault(labels, [0.0] * len(counts))
+            for index, count in enumerate(list(counts)):
+                summed[index] += count
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        shard = self._shards.mine()
+        counts = shard.get(labels)
+        if counts is None:
+            counts = [0.0] * (len(self.buckets) + 2)
+            shard[labels] = counts
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def collect(self) -> dict[Labels, list[float]]:
+        return self._shards.total()
+
+    def render(self) -> str:
+        samples: list[tuple[str, Labels, Labels, float]] = []
+        names = self.label_names + ("le",)
+        for labels, counts in sorted(self.collect().items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append(("_bucket", names, labels + (repr(bound),), cumulative))
+            cumulative += counts[len(self.buckets)]
+            samples.append(("_bucket", names, labels + ("+Inf",), cumulative))
+            samples.append(("_sum", self.label_names, labels, counts[-1]))
+            samples.append(("_count", self.label_names, labels, cumulative))
+        return format_family(self.name, self.description, "histogram", samples)
+
+
+_registry: list[Union[Counter, Histogram]] = []
+
+
+def render_registry() -> str:
+    return "".join(metric.render() for metric in _registry)
+
+
+REQUEST_SECONDS = Histogram(
+    "ijproblems_request_duration_seconds",
+    "Time to serve a request, until the last body chunk.",
+    ("method", "route", "status"),
+)
+FUNCTION_CALLS = Counter(
+    "ijproblems_function_calls_total",
+    "Calls of an internal function.",
+    ("function",),
+)
+FUNCTION_SECONDS = Counter(
+    "ijproblems_function_seconds_total",
+    "Time spent in an internal function.",
+    ("function",),
+)
+FUNCTION_QUERIES = Counter(
+    "ijproblems_function_queries_total",
+    "SQL statements executed by an internal function.",
+    ("function",),
+)
+POOL_ACQUIRE_SECONDS = Histogram(
+    "ijproblems_pool_acquire_seconds",
+    "Time to get a connection from the pool for a request.",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
@@ -1,77 +1,110 @@
+import math
 import os
 import random
-from dataclasses import dataclass
-from typing import Any, Optional
+import threading
+from array import array
+from datetime import datetime
+from typing import AbstractSet, Any, Optional
 
 from fastapi import Request
 
 from ijproblems.internal_functions.interface import (
+    DataVersion,
     Editorial,
     GitHubLoginInfo,
     InterfaceInternalFunctions,
     Preference,
     ProblemInfo,
     RankingRow,
+    UserRank,
+    session_github_login_info,
 )
 from ijproblems.internal_functions.points import POINTS
 
-
-@dataclass
-class AOJUser:
-    aoj_userid: str
-    total_point: list[int]
-    total_solved: list[int]
-    solved_counts: list[list[int]]
-    aoj_ids: set[int]
-
-    @classmethod
-    def from_aoj_ids(
-        cls,
-        aoj_userid: str,
-        aoj_ids: set[int],
-        problems: dict[int, ProblemInfo],
-        points: list[list[int]],
-    ) -> "AOJUser":
-        n = len(points)
-        total_point = [0] * n
-        total_solved = [0] * n
-        solved_counts = [[0] * len(points_element) for points_element in points]
-
-        for aoj_id in aoj_ids:
-            problem = problems[aoj_id]
-            contest_type = problem.contest_type
-            level = problem.level
-            total_point[contest_type] += points[contest_type][level - 1]
-            total_solved[contest_type] += 1
-            solved_counts[contest_type][level - 1] += 1
-
-        return AOJUser(
-            aoj_userid=aoj_userid,
-            total_point=total_point,
-            total_solved=total_solved,
-            solved_counts=solved_counts,
-            aoj_ids=aoj_ids,
-        )
-
-    def to_ranking_row(self, contest_type: int) -> RankingRow:
-        return RankingRow(
-            aoj_userid=self.aoj_userid,
-            total_point=self.total_point[contest_type],
-            total_solved=self.total_solved[contest_type],
-            solved_counts=self.solved_counts[contest_type],
-        )
+# the mock data set is generated from these on first use; the same values
+# always give the same data
+MOCK_SEED = int(os.environ.get("MOCK_SEED", "0"))
+MOCK_USERS = int(os.environ.get("MOCK_USERS", "2000"))
+# total number of problems, spread over the levels like the default layout
+MOCK_PROBLEMS = int(os.environ.get("MOCK_PROBLEMS", "469"))
+# mean probability that a user has solved a problem
+MOCK_SOLVE_DENSITY = float(os.environ.get("MOCK_SOLVE_DENSITY", "0.25"))
+# 0 makes every user and level equally likely; larger values skew solves
+# towards a few active users and towards lower levels
+MOCK_SOLVE_SPREAD = float(os.environ.get("MOCK_SOLVE_SPREAD", "0"))
+
+# problems per level of each contest type in the default layout
+_DEFAULT_LAYOUT = [
+    [20 - level for level, _ in enumerate(POINTS[0], 1)],
+    [40 - level for level, _ in enumerate(POINTS[1], 1)],
+]
+
+
+def _level_sizes(n_problems: int) -> list[list[int]]:
+    scale = n_problems / sum(map(sum, _DEFAULT_LAYOUT))
+    return [[round(size * scale) for size in sizes] for sizes in _DEFAULT_LAYOUT]
+
+
+def _level_weights(n_levels: int, spread: float) -> list[float]:
+    # decreasing in the level, with mean 1
+    weights = [
+        math.exp(-spread * index / max(n_levels - 1, 1)) for index in range(n_levels)
+    ]
+    mean = sum(weights) / n_levels
+    return [weight / mean for weight in weights]
+
+
+def _random_bits(rng: random.Random, width: int, probability: float) -> int:
+    """`width` bits, each set with `probability` to a precision of 1/256."""
+    numerator = round(probability * 256)
+    if width == 0 or numerator <= 0:
+        return 0
+    if numerator >= 256:
+        return (1 << width) - 1
+    # from the lowest binary digit of the probability up, OR-ing in random
+    # bits halves the distance to 1 and AND-ing them halves it to 0; digits
+    # below the lowest 1 would only AND into zero bits
+    digits = 8
+    while not numerator & 1:
+        numerator >>= 1
+        digits -= 1
+    bits = 0
+    for _ in range(digits):
+        if numerator & 1:
+            bits |= rng.getrandbits(width)
+        else:
+            bits &= rng.getrandbits(width)
+        numerator >>= 1
+    return bits
 
 
 class MockData:
-    def __init__(self) -> None:
+    """Reproducible problems and users sized for load testing.
+
+    Users are named `user0`, `user1`, ... and only stored as their index.
+    Per-user data is kept in flat arrays and solved problems in one integer
+    bitset per user, so hundreds of thousands of users stay cheap.
+    """
+
+    def __init__(
+        self,
+        seed: int,
+        n_users: int,
+        n_problems: int,
+        solve_density: float,
+        solve_spread: float,
+    ) -> None:
+        rng = random.Random(seed)
         self.points = POINTS
+        self.n_users = n_users
 
+        level_sizes = _level_sizes(n_problems)
         problems: list[ProblemInfo] = []
-        for level, _ in enumerate(self.points[0], 1):
-            for _n in range(20 - level):
+        for level, size in enumerate(level_sizes[0], 1):
+            for _n in range(size):
                 dummy_id = 1500 + len(problems)
-                likes = random.randint(0, level)
-                if random.randint(0, 1) == 0:
+                likes = rng.randint(0, level)
+                if rng.randint(0, 1) == 0:
                     org = "Official"
                     used_in = ""
                 else:
@@ -84,9 +117,9 @@ class MockData:
                         level=level,
                         aoj_id=dummy_id,
                         org=org,
-                        year=random.randint(2010, 2024),
+                        year=rng.randint(2010, 2024),
                         used_in=used_in,
-                        slot="ABCDEFGH"[random.randint(0, 7)],
+                        slot="ABCDEFGH"[rng.randint(0, 7)],
                         en=True,
                         ja=True,
                         likes=likes,
@@ -98,16 +131,16 @@ class MockData:
                     )
                 )
 
-        for level, _ in enumerate(self.points[1], 1):
-            for _n in range(40 - level):
+        for level, size in enumerate(level_sizes[1], 1):
+            for _n in range(size):
                 dummy_id = 2000 + len(problems)
                 ja = False
                 en = True
-                if random.randint(0, 4) == 0:
+                if rng.randint(0, 4) == 0:
                     ja = True
                     en = False
-                likes = random.randint(0, level)
-                if random.randint(0, 2) == 0:
+                likes = rng.randint(0, level)
+                if rng.randint(0, 2) == 0:
                     org = "Official"
                     used_in = ""
                 else:
@@ -124,9 +157,9 @@ class MockData:
                         level=level,
                         aoj_id=dummy_id,
                         org=org,
-                        year=random.randint(2010, 2024),
+                        year=rng.randint(2010, 2024),
                         used_in=used_in,
-                        slot="ABCDEFGHIJK"[random.randint(0, 10)],
+                        slot="ABCDEFGHIJK"[rng.randint(0, 10)],
                         en=en,
                         ja=ja,
                         likes=likes,
@@ -145,46 +178,157 @@ class MockData:
                     )
                 )
         self.problems = problems
-
         self.problems_dict = {problem.aoj_id: problem for problem in self.problems}
-        n_users = 2000
-        self.aoj_users: dict[str, AOJUser] = {}
-        for i in range(n_users):
-            aoj_userid = f"user{i}"
-            aoj_ids = set()
-            for problem in self.problems:
-                if random.randint(0, 3) == 0:
-                    aoj_ids.add(problem.aoj_id)
-
-            aoj_user = AOJUser.from_aoj_ids(
-                aoj_userid, aoj_ids, self.problems_dict, self.points
+
+        # problems are generated level by level, so bit `i` of a solved bitset
+        # is `problems[i]` and every level is a contiguous run of bits
+        groups: list[tuple[int, int, int, int]] = []
+        offset = 0
+        for contest_type, sizes in enumerate(level_sizes):
+            for level_index, size in enumerate(sizes):
+                groups.append((contest_type, level_index, offset, size))
+                offset += size
+        level_weights = [
+            _level_weights(len(sizes), solve_spread) for sizes in level_sizes
+        ]
+        # lognormal activity, scaled to mean 1
+        activity_scale = math.exp(solve_spread**2 / 2)
+
+        n_levels = [len(points) for points in self.points]
+        self.solved_bits: list[int] = []
+        self.total_point = [array("l", [0]) * n_users for _ in self.points]
+        self.total_solved = [array("l", [0]) * n_users for _ in self.points]
+        self.solved_counts = [array("H", [0]) * (n_users * n) for n in n_levels]
+        solvers = array("l", [0]) * len(problems)
+        for user in range(n_users):
+            activity = rng.lognormvariate(0, solve_spread) / activity_scale
+            bitset = 0
+            for contest_type, level_index, offset, size in groups:
+                probability = (
+                    solve_density * activity * level_weights[contest_type][level_index]
+                )
+                bits = _random_bits(rng, size, probability)
+                if not bits:
+                    continue
+                bitset |= bits << offset
+                count = bits.bit_count()
+                rest = bits
+                while rest:
+                    lowest = rest & -rest
+                    solvers[offset + lowest.bit_length() - 1] += 1
+                    rest ^= lowest
+                self.total_point[contest_type][user] += (
+                    count * self.points[contest_type][level_index]
+                )
+                self.total_solved[contest_type][user] += count
+                self.solved_counts[contest_type][
+                    user * n_levels[contest_type] + level_index
+                ] = count
+            self.solved_bits.append(bitset)
+        for problem, count in zip(problems, solvers):
+            problem.solvers = count
+
+        # global ranking order, ties broken by the user ID like the database
+        self.ranking: list[array] = []
+        self.ranks: list[array] = []
+        self.positions: list[array] = []
+        for total_point in self.total_point:
+            order = array(
+                "l",
+                sorted(
+                    range(n_users), key=lambda user: (-total_point[user], f"user{user}")
+                ),
+            )
+            ranks = array("l", [0]) * n_users
+            positions = array("l", [0]) * n_users
+            for index, user in enumerate(order):
+                if index > 0 and total_point[order[index - 1]] == total_point[user]:
+                    ranks[index] = ranks[index - 1]
+                else:
+                    ranks[index] = index + 1
+                positions[user] = index + 1
+            self.ranking.append(order)
+            self.ranks.append(ranks)
+            self.positions.append(positions)
+
+    def user_index(self, aoj_userid: str) -> Optional[int]:
+        number = aoj_userid.removeprefix("user")
+        if number == aoj_userid or not number.isdigit() or str(int(number)) != number:
+            return None
+        index = int(number)
+        return index if index < self.n_users else None
+
+    def ranking_row(self, contest_type: int, user: int) -> RankingRow:
+        n = len(self.points[contest_type])
+        position = self.positions[contest_type][user]
+        return RankingRow(
+            aoj_userid=f"user{user}",
+            total_point=self.total_point[contest_type][user],
+            total_solved=self.total_solved[contest_type][user],
+            solved_counts=list(
+                self.solved_counts[contest_type][user * n : user * n + n]
+            ),
+            rank=self.ranks[contest_type][position - 1],
+        )
+
+    def solved_aoj_ids(self, user: int) -> set[int]:
+        aoj_ids = set()
+        bits = self.solved_bits[user]
+        while bits:
+            lowest = bits & -bits
+            aoj_ids.add(self.problems[lowest.bit_length() - 1].aoj_id)
+            bits ^= lowest
+        return aoj_ids
+
+
+_mock_data: Optional[MockData] = None
+_mock_data_lock = threading.Lock()
+
+
+def get_mock_data() -> MockData:
+    """The mock data set, generated on first use."""
+    global _mock_data
+    with _mock_data_lock:
+        if _mock_data is None:
+            _mock_data = MockData(
+                seed=MOCK_SEED,
+                n_users=MOCK_USERS,
+                n_problems=MOCK_PROBLEMS,
+                solve_density=MOCK_SOLVE_DENSITY,
+                solve_spread=MOCK_SOLVE_SPREAD,
             )
-            self.aoj_users[aoj_userid] = aoj_user
+        return _mock_data
 
 
-mock_data = MockData()
 like_data: dict[int, set[int]] = {}
+like_versions: dict[int, int] = {}
+mock_started_at = datetime.utcnow().replace(microsecond=0)
+mock_versions = {
+    "catalog": DataVersion(version=1, updated_at=mock_started_at),
+    "crawl": DataVersion(version=1, updated_at=mock_started_at),
+    "likes": DataVersion(version=1, updated_at=mock_started_at),
+}
 
 
 class MockInternalFunctions(InterfaceInternalFunctions):
 
     def __init__(self, *args: Any) -> None:
-        pass
+        self.data = get_mock_data()
 
     def get_points(self, contest_type: int) -> list[int]:
-        return mock_data.points[contest_type]
+        return self.data.points[contest_type]
 
     def get_problems(
-        self, preference: Preference, user_solved_problems: set[int]
+        self, preference: Preference, user_solved_problems: AbstractSet[int]
     ) -> list[ProblemInfo]:
         contest_type = preference.contest_type
         begin = preference.level_scopes[contest_type]
         return sorted(
             [
                 problem
-                for problem in mock_data.problems
+                for problem in self.data.problems
                 if problem.contest_type == contest_type
-                and problem.level == begin
+                and (begin <= 0 or problem.level == begin)
                 and ((preference.ja and problem.ja) or (preference.en and problem.en))
                 and not (
                     preference.hide_solved and problem.aoj_id in user_solved_problems
@@ -194,22 +338,23 @@ class MockInternalFunctions(InterfaceInternalFunctions):
         )
 
     def get_problem(self, aoj_id: int) -> Optional[ProblemInfo]:
-        if aoj_id in mock_data.problems_dict:
-            return mock_data.problems_dict[aoj_id]
+        if aoj_id in self.data.problems_dict:
+            return self.data.problems_dict[aoj_id]
         return None
 
     def get_solved_user_count(self, aoj_id: int) -> int:
-        return 123
+        problem = self.data.problems_dict.get(aoj_id)
+        return problem.solvers if problem is not None else 0
 
     def get_problems_total_row(self, contest_type: int) -> RankingRow:
-        counts = [0] * len(mock_data.points[contest_type])
+        counts = [0] * len(self.data.points[contest_type])
         total_point = 0
-        for problem in mock_data.problems:
+        for problem in self.data.problems:
             if problem.contest_type != contest_type:
                 continue
             level = problem.level
             counts[level - 1] += 1
-            total_point += mock_data.points[contest_type][level - 1]
+            total_point += self.data.points[contest_type][level - 1]
 
         return RankingRow(
             aoj_userid="TOTAL",
@@ -221,31 +366,17 @@ class MockInternalFunctions(InterfaceInternalFunctions):
     def get_global_ranking(
         self, contest_type: int, begin: int, end: int
     ) -> list[RankingRow]:
-        aoj_users = sorted(
-            [aoj_user for aoj_user in mock_data.aoj_users.values()],
-            key=lambda aoj_user: aoj_user.total_point[contest_type],
-            reverse=True,
-        )
-        rows = [
-            aoj_user.to_ranking_row(contest_type)
-            for aoj_user in aoj_users[begin - 1 : end]
-        ]
-        return rows
+        order = self.data.ranking[contest_type][max(begin, 1) - 1 : max(end, 0)]
+        return [self.data.ranking_row(contest_type, user) for user in order]
 
     def get_user_count(self, contest_type: int) -> int:
-        return len(mock_data.aoj_users)
+        return self.data.n_users
 
     def get_github_login_info(self, request: Request) -> Optional[GitHubLoginInfo]:
         if os.environ.get("DUMMY_LOGIN"):
             return GitHubLoginInfo(github_id=123, login="dummy")
         else:
-            session = request.session
-            if "github_id" in session and "github_login" in session:
-                return GitHubLoginInfo(
-                    github_id=session["github_id"], login=session["github_login"]
-                )
-            else:
-                return None
+            return session_github_login_info(request)
 
     def get_likes(self, github_id: int) -> set[int]:
         if github_id in like_data:
@@ -260,31 +391,60 @@ class MockInternalFunctions(InterfaceInternalFunctions):
             like_data[github_id].add(aoj_id)
         else:
             like_data[github_id].discard(aoj_id)
-        return mock_data.problems_dict[aoj_id].likes + value
+        like_versions[aoj_id] = like_versions.get(aoj_id, 0) + 1
+        return self.data.problems_dict[aoj_id].likes + value
 
     def get_user_local_ranking(
         self, contest_type: int, aoj_userids: list[str]
     ) -> list[RankingRow]:
         rows: list[RankingRow] = []
         for aoj_userid in aoj_userids:
-            if aoj_userid not in mock_data.aoj_users:
+            user = self.data.user_index(aoj_userid)
+            if user is None:
                 empty_row = RankingRow(
                     aoj_userid=aoj_userid,
                     total_point=0,
                     total_solved=0,
-                    solved_counts=[0] * len(mock_data.points[contest_type]),
+                    solved_counts=[0] * len(self.data.points[contest_type]),
                 )
                 rows.append(empty_row)
             else:
-                user = mock_data.aoj_users[aoj_userid]
-                rows.append(user.to_ranking_row(contest_type))
-            rows = sorted(
-                rows, key=lambda row: (row.total_point, row.aoj_userid), reverse=True
-            )
-        return rows
+                rows.append(self.data.ranking_row(contest_type, user))
+        return sorted(
+            rows, key=lambda row: (row.total_point, row.aoj_userid), reverse=True
+        )
 
-    def get_user_solved_problems(self, aoj_userid: str) -> set[int]:
-        if aoj_userid in mock_data.aoj_users:
-            user = mock_data.aoj_users[aoj_userid]
-            return user.aoj_ids
-        return set()
+    def get_user_solved_problems(self, aoj_userid: str) -> AbstractSet[int]:
+        user = self.data.user_index(aoj_userid)
+        if user is None:
+            return set()
+        return self.data.solved_aoj_ids(user)
+
+    def refresh_solved_index(self) -> None:
+        # solved sets are part of the mock data
+        pass
+
+    def get_data_versions(self) -> dict[str, DataVersion]:
+        return dict(mock_versions)
+
+    def get_likes_version(self, contest_type: int) -> int:
+        return sum(
+            like_versions.get(problem.aoj_id, 0)
+            for problem in self.data.problems
+            if problem.contest_type == contest_type
+        )
+
+    def get_problem_likes_version(self, aoj_id: int) -> int:
+        return like_versions.get(aoj_id, 0)
+
+    def get_user_rank(self, contest_type: int, aoj_userid: str) -> Optional[UserRank]:
+        aoj_userid = aoj_userid.lower()
+        user = self.data.user_index(aoj_userid)
+        if user is None:
+            return None
+        position = self.data.positions[contest_type][user]
+        return UserRank(
+            aoj_userid=aoj_userid,
+            rank=self.data.ranks[contest_type][position - 1],
+            position=position,
+        )
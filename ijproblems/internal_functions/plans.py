@@ -0,0 +1,164 @@
+from dataclasses import replace
+from typing import AbstractSet, Any, Generator, Optional, TypeVar, Union
+
+from ijproblems.internal_functions.catalog import (
+    ProblemCatalog,
+    catalog_cache,
+    finish_problems,
+)
+from ijproblems.internal_functions.interface import (
+    DataVersion,
+    PageContext,
+    PageContextQuery,
+    Preference,
+    ProblemInfo,
+)
+from ijproblems.internal_functions.invalidation import invalidation_bus
+from ijproblems.internal_functions.likes_cache import like_versions, likes_cache
+from ijproblems.internal_functions.queries import (
+    Query,
+    acceptances_after_query,
+    catalog_problems_query,
+    catalog_version_query,
+    data_versions_query,
+    like_versions_query,
+    likes_query,
+    likes_version_query,
+    page_context_queries,
+    problem_counts_query,
+    set_like_query,
+    to_page_context,
+)
+from ijproblems.internal_functions.solved_index import AcceptanceRow, SolvedIndex
+
+T = TypeVar("T")
+
+SOLVED_INDEX_BATCH_SIZE = 100000
+
+# A plan yields either one query, getting back its parsed result, or several
+# independent ones to be sent in one pipeline, getting back a dict of results
+# with the same keys. It returns the answer of the backend method.
+#
+# Plans hold what both database backends share (caches and versioning), so
+# that a backend only has to run the queries.
+Step = Union[Query[Any], dict[str, Query[Any]]]
+Plan = Generator[Step, Any, T]
+
+
+def catalog_plan() -> Plan[ProblemCatalog]:
+    catalog = catalog_cache.current()
+    if catalog is not None and not catalog_cache.needs_check():
+        return catalog
+
+    # read the version first so that a concurrent update can only make the
+    # loaded snapshot look older than it is, never newer
+    version: int = yield catalog_version_query()
+    if catalog is not None and catalog.version == version:
+        catalog_cache.mark_checked()
+        return catalog
+
+    problems: list[ProblemInfo] = yield catalog_problems_query()
+    catalog = ProblemCatalog.build(version, problems)
+    catalog_cache.install(catalog)
+    return catalog
+
+
+def problems_plan(
+    preference: Preference, user_solved_problems: AbstractSet[int]
+) -> Plan[list[ProblemInfo]]:
+    catalog = yield from catalog_plan()
+    problems = catalog.select_preferred(preference, user_solved_problems)
+    problem_counts = yield problem_counts_query(
+        [problem.aoj_id for problem in problems]
+    )
+    return finish_problems(problems, problem_counts)
+
+
+def likes_plan(github_id: int) -> Plan[set[int]]:
+    cached = likes_cache.get(github_id)
+    if cached is not None:
+        return set(cached)
+    generation = likes_cache.generation()
+    likes: set[int] = yield likes_query(github_id)
+    likes_cache.put(github_id, likes, generation)
+    return likes
+
+
+def set_like_plan(github_id: int, aoj_id: int, value: int) -> Plan[int]:
+    if value not in (0, 1):
+        raise NotImplementedError
+    counter = yield set_like_query(github_id, aoj_id, value, likes_cache.origin)
+    if counter is None:
+        raise Exception(f"invalid aoj_id: {aoj_id}")
+    likes, version = counter
+    likes_cache.update(github_id, aoj_id, value)
+    # without waiting for the event, so this worker's next page shows it
+    like_versions.update(aoj_id, version)
+    return likes
+
+
+def solved_index_batch_query(index: SolvedIndex) -> Query[list[AcceptanceRow]]:
+    """The next rows to `apply`; fewer than a batch means the index caught up."""
+    return acceptances_after_query(index.last_seq or 0, SOLVED_INDEX_BATCH_SIZE)
+
+
+def data_versions_plan() -> Plan[dict[str, DataVersion]]:
+    versions = invalidation_bus.versions()
+    if versions is not None:
+        return versions
+    return (yield data_versions_query())
+
+
+def likes_version_plan(aoj_ids: list[int]) -> Plan[int]:
+    version = like_versions.total(aoj_ids)
+    if version is not None:
+        return version
+    if like_versions.active:
+        generation = like_versions.generation()
+        like_versions.load((yield like_versions_query()), generation)
+        version = like_versions.total(aoj_ids)
+        if version is not None:
+            return version
+    return (yield likes_version_query(aoj_ids))
+
+
+def contest_likes_version_plan(contest_type: int) -> Plan[int]:
+    catalog = yield from catalog_plan()
+    return (
+        yield from likes_version_plan(
+            [problem.aoj_id for problem in catalog.select(contest_type, -1)]
+        )
+    )
+
+
+def page_context_plan(
+    query: PageContextQuery, user_solved_problems: AbstractSet[int]
+) -> Plan[PageContext]:
+    """Everything but the solved problems, which the backend reads beforehand.
+
+    The statements of `page_context_queries` are yielded as one step.
+    """
+    # in-memory state may need a refresh, which must not happen mid-pipeline
+    catalog: Optional[ProblemCatalog] = None
+    if query.total_row or query.problems_preference is not None:
+        catalog = yield from catalog_plan()
+    problems: list[ProblemInfo] = []
+    if catalog is not None and query.problems_preference is not None:
+        problems = catalog.select_preferred(
+            query.problems_preference, user_solved_problems
+        )
+
+    cached_likes: Optional[frozenset[int]] = None
+    likes_generation = likes_cache.generation()
+    if query.likes_github_id is not None:
+        cached_likes = likes_cache.get(query.likes_github_id)
+    queries = page_context_queries(
+        query if cached_likes is None else replace(query, likes_github_id=None),
+        problems,
+    )
+    results: dict[str, Any] = yield queries
+    if cached_likes is not None:
+        results["user_likes"] = set(cached_likes)
+    elif query.likes_github_id is not None:
+        likes_cache.put(query.likes_github_id, results["user_likes"], likes_generation)
+    return to_page_context(query, catalog, problems, user_solved_problems, results)
@@ -0,0 +1,466 @@
+import json
+from dataclasses import dataclass
+from typing import AbstractSet, Any, Callable, Generic, Optional, TypeVar
+
+from ijproblems.internal_functions.catalog import ProblemCatalog, finish_problems
+from ijproblems.internal_functions.interface import (
+    DataVersion,
+    Editorial,
+    PageContext,
+    PageContextQuery,
+    ProblemInfo,
+    RankingRow,
+    UserRank,
+)
+from ijproblems.internal_functions.invalidation import INVALIDATION_CHANNEL
+from ijproblems.internal_functions.points import POINTS
+from ijproblems.internal_functions.solved_index import AcceptanceRow
+
+T = TypeVar("T")
+Row = dict[str, Any]
+
+
+@dataclass(frozen=True)
+class Query(Generic[T]):
+    """A statement together with the parser of its result rows.
+
+    Rows are passed to `parse` as dicts (`psycopg.rows.dict_row`), so that
+    the same query can be run on a plain connection, inside a pipeline or
+    on an async connection.
+    A `commit` query writes, and is committed in the round trip that sends it.
+    """
+
+    sql: str
+    params: dict[str, Any]
+    parse: Callable[[list[Row]], T]
+    commit: bool = False
+
+
+@dataclass
+class RankingRowFromDatabase:
+    aoj_userid: str
+    total: int
+    counts_per_levels: str
+    rank: Optional[int] = None
+
+    def to_ranking_row(self) -> RankingRow:
+        counts: list[int] = json.loads(self.counts_per_levels)
+        solved = sum(counts)
+
+        return RankingRow(
+            aoj_userid=self.aoj_userid,
+            total_point=self.total,
+            total_solved=solved,
+            solved_counts=counts,
+            rank=self.rank,
+        )
+
+
+def parse_meta(problem_info: ProblemInfo) -> None:
+    meta = problem_info.meta
+    meta_obj = json.loads(meta)
+
+    for key in ("solved_teams", "participated_teams", "authors"):
+        if key in meta_obj:
+            setattr(problem_info, key, meta_obj[key])
+
+    problem_info.editorials = [
+        Editorial(**editorial) for editorial in meta_obj["editorials"]
+    ]
+
+
+def _to_problem_info(row: Row) -> ProblemInfo:
+    # stored as INTEGER
+    problem = ProblemInfo(**{**row, "ja": bool(row["ja"]), "en": bool(row["en"])})
+    parse_meta(problem)
+    return problem
+
+
+def _to_ranking_rows(rows: list[Row]) -> list[RankingRow]:
+    return [RankingRowFromDatabase(**row).to_ranking_row() for row in rows]
+
+
+def _to_count(rows: list[Row]) -> int:
+    if len(rows) == 0:
+        raise Exception("database error")
+    return rows[0]["count"]
+
+
+def catalog_version_query() -> Query[int]:
+    def parse(rows: list[Row]) -> int:
+        return rows[0]["version"] if rows else 0
+
+    return Query(
+        "SELECT version FROM data_versions WHERE name='catalog'",
+        {},
+        parse,
+    )
+
+
+def data_versions_query() -> Query[dict[str, DataVersion]]:
+    def parse(rows: list[Row]) -> dict[str, DataVersion]:
+        return {
+            row["name"]: DataVersion(
+                version=row["version"], updated_at=row["updated_at"]
+            )
+            for row in rows
+        }
+
+    return Query("SELECT name, version, updated_at FROM data_versions", {}, parse)
+
+
+def catalog_problems_query() -> Query[list[ProblemInfo]]:
+    def parse(rows: list[Row]) -> list[ProblemInfo]:
+        return [_to_problem_info(row) for row in rows]
+
+    return Query(
+        "SELECT contest_type,"
+        "name,"
+        "level,"
+        "problem_id AS aoj_id,"
+        "org,"
+        "year,"
+        "used_in,"
+        "slot,"
+        "en,"
+        "ja,"
+        "inherited_likes,"
+        "meta "
+        "FROM problems",
+        {},
+        parse,
+    )
+
+
+def problem_counts_query(aoj_ids: list[int]) -> Query[dict[int, tuple[int, int]]]:
+    """Likes and solvers of each problem."""
+
+    def parse(rows: list[Row]) -> dict[int, tuple[int, int]]:
+        return {row["problem_id"]: (row["likes"], row["solvers"]) for row in rows}
+
+    return Query(
+        "SELECT PL.problem_id, PL.likes, COALESCE(PS.solvers, 0) AS solvers "
+        "FROM problem_likes AS PL "
+        "LEFT JOIN problem_solvers AS PS ON PL.problem_id = PS.problem_id "
+        "WHERE PL.problem_id = ANY(%(problem_ids)s)",
+        {"problem_ids": aoj_ids},
+        parse,
+    )
+
+
+def problem_query(aoj_id: int) -> Query[Optional[ProblemInfo]]:
+    def parse(rows: list[Row]) -> Optional[ProblemInfo]:
+        if len(rows) == 0:
+            return None
+        return _to_problem_info(rows[0])
+
+    return Query(
+        "SELECT contest_type,"
+        "name,"
+        "level,"
+        "P.problem_id AS aoj_id,"
+        "org,"
+        "year,"
+        "used_in,"
+        "slot,"
+        "en,"
+        "ja,"
+        "inherited_likes,"
+        "meta,"
+        "COALESCE(PL.likes, inherited_likes) AS likes,"
+        "COALESCE(PS.solvers, 0) AS solvers "
+        "FROM problems AS P "
+        "LEFT JOIN problem_likes AS PL ON P.problem_id = PL.problem_id "
+        "LEFT JOIN problem_solvers AS PS ON P.problem_id = PS.problem_id "
+        "WHERE P.problem_id=%(problem_id)s",
+        {"problem_id": aoj_id},
+        parse,
+    )
+
+
+def solved_user_count_query(aoj_id: int) -> Query[int]:
+    return Query(
+        "SELECT COALESCE(MAX(solvers), 0) AS count "
+        "FROM problem_solvers "
+        "WHERE problem_id=%(problem_id)s",
+        {
+            "problem_id": aoj_id,
+        },
+        _to_count,
+    )
+
+
+def set_like_query(
+    github_id: int, aoj_id: int, value: int, origin: str
+) -> Query[Optional[tuple[int, int]]]:
+    """Like (`value` 1) or unlike (0) a problem.
+
+    Returns the new like count of the problem and its like version, or None
+    if the problem does not exist. The likes row and the counter change in
+    this one statement, which also sends the invalidation event, tagged
+    with `origin`.
+    """
+
+    def parse(rows: list[Row]) -> Optional[tuple[int, int]]:
+        return (rows[0]["likes"], rows[0]["version"]) if rows else None
+
+    return Query(
+        "WITH problem AS ("
+        "SELECT likes, version FROM problem_likes WHERE problem_id = %(problem_id)s"
+        "), "
+        "inserted AS ("
+        "INSERT INTO likes (github_id, problem_id) "
+        "SELECT %(github_id)s, %(problem_id)s FROM problem WHERE %(value)s = 1 "
+        "ON CONFLICT (github_id, problem_id) DO NOTHING "
+        "RETURNING 1"
+        "), "
+        "deleted AS ("
+        "DELETE FROM likes "
+        "WHERE %(value)s = 0 "
+        "AND github_id = %(github_id)s AND problem_id = %(problem_id)s "
+        "RETURNING 1"
+        "), "
+        "delta AS ("
+        "SELECT (SELECT COUNT(*) FROM inserted) - (SELECT COUNT(*) FROM deleted) "
+        "AS delta"
+        "), "
+        "counter AS ("
+        "UPDATE problem_likes "
+        "SET likes = likes + delta.delta, version = version + 1 "
+        "FROM delta "
+        "WHERE problem_id = %(problem_id)s AND delta.delta <> 0 "
+        "RETURNING likes, version"
+        "), "
+        "notified AS ("
+        "SELECT pg_notify(%(channel)s, json_build_object("
+        "'data', 'likes', "
+        "'problem_id', %(problem_id)s::INTEGER, "
+        "'like_version', version, "
+        "'github_id', %(github_id)s::BIGINT, "
+        "'origin', %(origin)s::TEXT"
+        ")::TEXT) "
+        "FROM counter"
+        ") "
+        # a plain CTE only runs if it is referenced
+        "SELECT COALESCE((SELECT likes FROM counter), likes) AS likes, "
+        "COALESCE((SELECT version FROM counter), version) AS version, "
+        "(SELECT COUNT(*) FROM notified) AS notified "
+        "FROM problem",
+        {
+            "github_id": github_id,
+            "problem_id": aoj_id,
+            "value": value,
+            "channel": INVALIDATION_CHANNEL,
+            "origin": origin,
+        },
+        parse,
+        commit=True,
+    )
+
+
+def like_versions_query() -> Query[dict[int, int]]:
+    def parse(rows: list[Row]) -> dict[int, int]:
+        return {row["problem_id"]: row["version"] for row in rows}
+
+    return Query("SELECT problem_id, version FROM problem_likes", {}, parse)
+
+
+def likes_version_query(aoj_ids: list[int]) -> Query[int]:
+    """Sum of the like versions of the problems, which grows with every like."""
+    return Query(
+        "SELECT COALESCE(SUM(version), 0)::BIGINT AS count "
+        "FROM problem_likes "
+        "WHERE problem_id = ANY(%(problem_ids)s)",
+        {"problem_ids": aoj_ids},
+        _to_count,
+    )
+
+
+def global_ranking_query(
+    contest_type: int, begin: int, end: int
+) -> Query[list[RankingRow]]:
+    return Query(
+        "SELECT aoj_userid, total, counts_per_levels, rank "
+        "FROM user_ranks "
+        "WHERE contest_type=%(contest_type)s "
+        "AND position BETWEEN %(begin)s AND %(end)s "
+        "ORDER BY position",
+        {
+            "contest_type": contest_type,
+            "begin": begin,
+            "end": end,
+        },
+        _to_ranking_rows,
+    )
+
+
+def user_count_query(contest_type: int) -> Query[int]:
+    # positions are dense, so the last one is the count; an index lookup
+    return Query(
+        "SELECT COALESCE(MAX(position), 0) AS count "
+        "FROM user_ranks "
+        "WHERE contest_type=%(contest_type)s ",
+        {
+            "contest_type": contest_type,
+        },
+        _to_count,
+    )
+
+
+def likes_query(github_id: int) -> Query[set[int]]:
+    def parse(rows: list[Row]) -> set[int]:
+        return set(row["problem_id"] for row in rows)
+
+    return Query(
+        "SELECT problem_id FROM likes WHERE github_id=%(github_id)s ",
+        {
+            "github_id": github_id,
+        },
+        parse,
+    )
+
+
+def user_local_ranking_query(
+    contest_type: int, aoj_userids: list[str]
+) -> Query[list[RankingRow]]:
+    aoj_userids = [aoj_userid.lower() for aoj_userid in aoj_userids]
+
+    def parse(rows: list[Row]) -> list[RankingRow]:
+        found = {
+            row["aoj_userid"]: RankingRowFromDatabase(**row).to_ranking_row()
+            for row in rows
+        }
+
+        ranking_rows = []
+        for aoj_userid in aoj_userids:
+            ranking_row = found.get(aoj_userid)
+            if ranking_row is None:
+                ranking_rows.append(
+                    RankingRow(
+                        aoj_userid=aoj_userid,
+                        total_point=0,
+                        total_solved=0,
+                        solved_counts=[0] * len(POINTS[contest_type]),
+                    )
+                )
+            else:
+                ranking_rows.append(ranking_row)
+
+        return sorted(ranking_rows, key=lambda row: -row.total_point)
+
+    return Query(
+        "SELECT UP.aoj_userid, UP.total, UP.counts_per_levels, UR.rank "
+        "FROM user_points AS UP "
+        "LEFT JOIN user_ranks AS UR "
+        "ON UP.contest_type = UR.contest_type AND UP.aoj_userid = UR.aoj_userid "
+        "WHERE UP.contest_type=%(contest_type)s "
+        "AND UP.aoj_userid = ANY(%(aoj_userids)s)",
+        {"contest_type": contest_type, "aoj_userids": aoj_userids},
+        parse,
+    )
+
+
+def user_rank_query(contest_type: int, aoj_userid: str) -> Query[Optional[UserRank]]:
+    def parse(rows: list[Row]) -> Optional[UserRank]:
+        if len(rows) == 0:
+            return None
+        return UserRank(**rows[0])
+
+    return Query(
+        "SELECT aoj_userid, rank, position "
+        "FROM user_ranks "
+        "WHERE contest_type=%(contest_type)s AND aoj_userid=%(aoj_userid)s",
+        {"contest_type": contest_type, "aoj_userid": aoj_userid.lower()},
+        parse,
+    )
+
+
+def acceptances_after_query(seq: int, limit: int) -> Query[list[AcceptanceRow]]:
+    def parse(rows: list[Row]) -> list[AcceptanceRow]:
+        return [(row["aoj_userid"], row["problem_id"], row["seq"]) for row in rows]
+
+    return Query(
+        "SELECT aoj_userid, problem_id, seq "
+        "FROM aoj_acceptances "
+        "WHERE seq > %(seq)s "
+        "ORDER BY seq LIMIT %(limit)s",
+        {"seq": seq, "limit": limit},
+        parse,
+    )
+
+
+def hot_queries() -> list[Query[Any]]:
+    """Queries run on most requests, with parameters of the usual types.
+
+    psycopg keys prepared statements by the parameter types as well, and
+    picks the smallest integer type that fits, so the values matter. They
+    are chosen to match no rows, since every new connection runs these.
+    """
+    return [
+        data_versions_query(),
+        catalog_version_query(),
+        problem_counts_query([0]),
+        likes_query(-(2**31)),
+        problem_query(0),
+        solved_user_count_query(0),
+        global_ranking_query(0, 0, 0),
+        user_count_query(0),
+        user_local_ranking_query(0, [""]),
+        user_rank_query(0, ""),
+        acceptances_after_query(2**31 - 1, 100000),
+    ]
+
+
+def page_context_queries(
+    query: PageContextQuery, problems: list[ProblemInfo]
+) -> dict[str, Query[Any]]:
+    """Independent statements answering `query`, keyed by `PageContext` field.
+
+    `problems` is the catalog selection for `query.problems_preference`,
+    already without hidden solved problems; its like and solver counts are
+    fetched under the extra key "problem_counts".
+    The TOTAL row and solved problems are served from memory, not from here.
+    """
+    queries: dict[str, Query[Any]] = {}
+    if query.local_ranking_userids is not None:
+        queries["local_ranking"] = user_local_ranking_query(
+            query.contest_type, query.local_ranking_userids
+        )
+    if query.problems_preference is not None:
+        queries["problem_counts"] = problem_counts_query(
+            [problem.aoj_id for problem in problems]
+        )
+    if query.likes_github_id is not None:
+        queries["user_likes"] = likes_query(query.likes_github_id)
+    if query.global_ranking_range is not None:
+        begin, end = query.global_ranking_range
+        queries["global_ranking"] = global_ranking_query(query.contest_type, begin, end)
+    if query.user_count:
+        queries["user_count"] = user_count_query(query.contest_type)
+    if query.problem_aoj_id is not None:
+        queries["problem"] = problem_query(query.problem_aoj_id)
+    return queries
+
+
+def to_page_context(
+    query: PageContextQuery,
+    catalog: Optional[ProblemCatalog],
+    problems: list[ProblemInfo],
+    user_solved_problems: AbstractSet[int],
+    results: dict[str, Any],
+) -> PageContext:
+    """Assemble the parsed results of `page_context_queries`.
+
+    `catalog` must be given if `query.total_row` is set.
+    """
+    results = dict(results)
+    problem_counts = results.pop("problem_counts", {})
+    context = PageContext(**results, user_solved_problems=user_solved_problems)
+    if query.total_row:
+        assert catalog is not None
+        context.total_row = catalog.total_row(query.contest_type)
+    if query.problems_preference is not None:
+        context.problems = finish_problems(problems, problem_counts)
+    if context.problem is not None:
+        context.problem_solved_user_count = context.problem.solvers
+    return context
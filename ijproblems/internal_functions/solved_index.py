@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+from collections.abc import Set
+from typing import AbstractSet, Any, Iterable, Iterator, Optional
+
+from ijproblems.internal_functions.catalog import ProblemCatalog
+from ijproblems.internal_functions.invalidation import invalidation_bus
+from ijproblems.internal_functions.points import POINTS
+
+SOLVED_INDEX_REFRESH_INTERVAL_SECOND = float(
+    os.environ.get("SOLVED_INDEX_REFRESH_INTERVAL_SECOND", "10")
+)
+
+# (aoj_userid, problem_id, seq) as stored in aoj_acceptances
+AcceptanceRow = tuple[str, int, int]
+
+
+class ProblemOrdinals:
+    """Append-only mapping between AOJ problem IDs and dense bit positions."""
+
+    def __init__(self) -> None:
+        self.problem_ids: list[int] = []
+        self.ordinal_of: dict[int, int] = {}
+
+    def get_or_add(self, aoj_id: int) -> int:
+        ordinal = self.ordinal_of.get(aoj_id)
+        if ordinal is None:
+            ordinal = len(self.problem_ids)
+            self.problem_ids.append(aoj_id)
+            self.ordinal_of[aoj_id] = ordinal
+        return ordinal
+
+
+class SolvedProblems(Set[int]):
+    """Immutable set of solved AOJ problem IDs backed by a bitset."""
+
+    def __init__(self, bits: int, ordinals: ProblemOrdinals) -> None:
+        self.bits = bits
+        self.ordinals = ordinals
+
+    def __contains__(self, aoj_id: object) -> bool:
+        if not isinstance(aoj_id, int):
+            return False
+        ordinal = self.ordinals.ordinal_of.get(aoj_id)
+        return ordinal is not None and (self.bits >> ordinal) & 1 == 1
+
+    def __iter__(self) -> Iterator[int]:
+        bits = self.bits
+        while bits:
+            lowest = bits & -bits
+            yield self.ordinals.problem_ids[lowest.bit_length() - 1]
+            bits ^= lowest
+
+    def __len__(self) -> int:
+        return self.bits.bit_count()
+
+    def count_in(self, mask: int) -> int:
+        """Number of solved problems among the bits of `mask`."""
+        return (self.bits & mask).bit_count()
+
+    def _bits_of(self, other: "SolvedProblems") -> int:
+        if other.ordinals is not self.ordinals:
+            raise ValueError("solved sets from different indexes")
+        return other.bits
+
+    # between users of one index the operators work on the bitsets; with
+    # other sets they fall back to the element-wise ones of `Set`
+
+    def __and__(self, other: AbstractSet[Any]) -> AbstractSet[int]:
+        if isinstance(other, SolvedProblems):
+            return SolvedProblems(self.bits & self._bits_of(other), self.ordinals)
+        return super().__and__(other)
+
+    def __or__(self, other: AbstractSet[Any]) -> AbstractSet[Any]:
+        if isinstance(other, SolvedProblems):
+            return SolvedProblems(self.bits | self._bits_of(other), self.ordinals)
+        return super().__or__(other)
+
+    def __sub__(self, other: AbstractSet[Any]) -> AbstractSet[int]:
+        if isinstance(other, SolvedProblems):
+            return SolvedProblems(self.bits & ~self._bits_of(other), self.ordinals)
+        return super().__sub__(other)
+
+    def __xor__(self, other: AbstractSet[Any]) -> AbstractSet[Any]:
+        if isinstance(other, SolvedProblems):
+            return SolvedProblems(self.bits ^ self._bits_of(other), self.ordinals)
+        return super().__xor__(other)
+
+    @classmethod
+    def _from_iterable(cls, it: Iterable[int]) -> frozenset[int]:
+        # results of the element-wise operators
+        return frozenset(it)
+
+
+class SolvedIndex:
+    """Per-worker bitsets of solved problems for every AOJ user.
+
+    Built from aoj_acceptances and then advanced by tailing rows whose `seq`
+    is beyond the last one applied. This relies on the crawler being the
+    only writer, so that rows become visible in `seq` order.
+
+    Rows are tailed every `refresh_interval_second`, or while the
+    invalidation listener is connected, once the "crawl" version moved.
+    """
+
+    def __init__(self, refresh_interval_second: float) -> None:
+        self.refresh_interval_second = refresh_interval_second
+        self.ordinals = ProblemOrdinals()
+        self.last_seq: Optional[int] = None
+        self._bits: dict[str, int] = {}
+        # held by whoever is loading rows, so a cold index is loaded only once
+        self.refresh_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._refreshed_at = 0.0
+        self._refreshed_version = -1
+        # per contest type, for the catalog version in `_level_masks_version`
+        self._level_masks: dict[int, list[int]] = {}
+        self._level_masks_version = -1
+
+    def needs_refresh(self) -> bool:
+        if self.last_seq is None:
+            return True
+        latest = invalidation_bus.version("crawl")
+        if latest is not None:
+            return self._refreshed_version < latest
+        return time.monotonic() - self._refreshed_at >= self.refresh_interval_second
+
+    def crawl_version(self) -> int:
+        """To be read before tailing rows and then passed to `mark_refreshed`."""
+        version = invalidation_bus.version("crawl")
+        return version if version is not None else -1
+
+    def mark_refreshed(self, crawl_version: int) -> None:
+        self._refreshed_at = time.monotonic()
+        self._refreshed_version = crawl_version
+
+    def apply(self, rows: Iterable[AcceptanceRow]) -> None:
+        with self._lock:
+            last_seq = self.last_seq or 0
+            for aoj_userid, aoj_id, seq in rows:
+                if seq <= last_seq:
+                    continue
+                ordinal = self.ordinals.get_or_add(aoj_id)
+                self._bits[aoj_userid] = self._bits.get(aoj_userid, 0) | (1 << ordinal)
+                last_seq = seq
+            self.last_seq = last_seq
+
+    def solved(self, aoj_userid: str) -> SolvedProblems:
+        return SolvedProblems(self._bits.get(aoj_userid.lower(), 0), self.ordinals)
+
+    def level_masks(self, catalog: ProblemCatalog, contest_type: int) -> list[int]:
+        """Bit masks of the problems of each level, index 0 being level 1."""
+        with self._lock:
+            if self._level_masks_version != catalog.version:
+                self._level_masks = {}
+                self._level_masks_version = catalog.version
+            masks = self._level_masks.get(contest_type)
+            if masks is None:
+                masks = []
+                for level in range(1, len(POINTS[contest_type]) + 1):
+                    mask = 0
+                    for problem in catalog.select(contest_type, level):
+                        # unsolved problems get a bit as well
+                        mask |= 1 << self.ordinals.get_or_add(problem.aoj_id)
+                    masks.append(mask)
+                self._level_masks[contest_type] = masks
+            return masks
+
+    def level_counts(
+        self, aoj_userid: str, catalog: ProblemCatalog, contest_type: int
+    ) -> list[int]:
+        """Solved problems of each level, as in counts_per_levels."""
+        solved = self.solved(aoj_userid)
+        return [
+            solved.count_in(mask) for mask in self.level_masks(catalog, contest_type)
+        ]
+
+
+solved_index = SolvedIndex(SOLVED_INDEX_REFRESH_INTERVAL_SECOND)
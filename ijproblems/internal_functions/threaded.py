@@ -0,0 +1,103 @@
+from typing import AbstractSet, Optional
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+
+from ijproblems.internal_functions.interface import (
+    AsyncInterfaceInternalFunctions,
+    DataVersion,
+    GitHubLoginInfo,
+    InterfaceInternalFunctions,
+    PageContext,
+    PageContextQuery,
+    Preference,
+    ProblemInfo,
+    RankingRow,
+    UserRank,
+)
+
+
+class ThreadedInternalFunctions(AsyncInterfaceInternalFunctions):
+    """Exposes a blocking `InterfaceInternalFunctions` to async routes.
+
+    Each call runs on the threadpool, so the event loop is never blocked.
+    """
+
+    def __init__(self, functions: InterfaceInternalFunctions) -> None:
+        self.functions = functions
+
+    def get_points(self, contest_type: int) -> list[int]:
+        return self.functions.get_points(contest_type)
+
+    async def get_problems(
+        self, preference: Preference, user_solved_problems: AbstractSet[int]
+    ) -> list[ProblemInfo]:
+        return await run_in_threadpool(
+            self.functions.get_problems, preference, user_solved_problems
+        )
+
+    async def get_problem(self, aoj_id: int) -> Optional[ProblemInfo]:
+        return await run_in_threadpool(self.functions.get_problem, aoj_id)
+
+    async def get_solved_user_count(self, aoj_id: int) -> int:
+        return await run_in_threadpool(self.functions.get_solved_user_count, aoj_id)
+
+    async def get_problems_total_row(self, contest_type: int) -> RankingRow:
+        return await run_in_threadpool(
+            self.functions.get_problems_total_row, contest_type
+        )
+
+    async def get_global_ranking(
+        self, contest_type: int, begin: int, end: int
+    ) -> list[RankingRow]:
+        return await run_in_threadpool(
+            self.functions.get_global_ranking, contest_type, begin, end
+        )
+
+    async def get_user_count(self, contest_type: int) -> int:
+        return await run_in_threadpool(self.functions.get_user_count, contest_type)
+
+    def get_github_login_info(self, request: Request) -> Optional[GitHubLoginInfo]:
+        return self.functions.get_github_login_info(request)
+
+    async def get_likes(self, github_id: int) -> set[int]:
+        return await run_in_threadpool(self.functions.get_likes, github_id)
+
+    async def set_like(self, github_id: int, aoj_id: int, value: int) -> int:
+        return await run_in_threadpool(
+            self.functions.set_like, github_id, aoj_id, value
+        )
+
+    async def get_user_local_ranking(
+        self, contest_type: int, aoj_userids: list[str]
+    ) -> list[RankingRow]:
+        return await run_in_threadpool(
+            self.functions.get_user_local_ranking, contest_type, aoj_userids
+        )
+
+    async def get_user_solved_problems(self, aoj_userid: str) -> AbstractSet[int]:
+        return await run_in_threadpool(
+            self.functions.get_user_solved_problems, aoj_userid
+        )
+
+    async def refresh_solved_index(self) -> None:
+        await run_in_threadpool(self.functions.refresh_solved_index)
+
+    async def get_user_rank(
+        self, contest_type: int, aoj_userid: str
+    ) -> Optional[UserRank]:
+        return await run_in_threadpool(
+            self.functions.get_user_rank, contest_type, aoj_userid
+        )
+
+    async def get_data_versions(self) -> dict[str, DataVersion]:
+        return await run_in_threadpool(self.functions.get_data_versions)
+
+    async def get_likes_version(self, contest_type: int) -> int:
+        return await run_in_threadpool(self.functions.get_likes_version, contest_type)
+
+    async def get_problem_likes_version(self, aoj_id: int) -> int:
+        return await run_in_threadpool(self.functions.get_problem_likes_version, aoj_id)
+
+    async def get_page_context(self, query: PageContextQuery) -> PageContext:
+        return await run_in_threadpool(self.functions.get_page_context, query)
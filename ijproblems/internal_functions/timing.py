@@ -0,0 +1,172 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator, Optional
+
+import psycopg
+from psycopg.abc import Params, Query
+from psycopg.rows import Row
+from typing_extensions import Self
+
+from ijproblems.internal_functions.metrics import (
+    FUNCTION_CALLS,
+    FUNCTION_QUERIES,
+    FUNCTION_SECONDS,
+)
+
+# per-request timing; cheap enough to stay on in production
+REQUEST_TIMING = os.environ.get("REQUEST_TIMING", "1") != "0"
+
+
+@dataclass
+class RequestTimings:
+    """Where the time of one request went.
+
+    `call_seconds` is the time spent in interface methods, which includes
+    `sql_seconds`; the rest of the request is Python in the routes and
+    `render_seconds` of templates.
+    """
+
+    started: float = field(default_factory=time.perf_counter)
+    sql_count: int = 0
+    sql_seconds: float = 0.0
+    call_count: int = 0
+    call_seconds: float = 0.0
+    render_seconds: float = 0.0
+    # per interface method: number of calls and their total time
+    calls: dict[str, list[float]] = field(default_factory=dict)
+
+    def add_call(self, name: str, seconds: float) -> None:
+        self.call_count += 1
+        self.call_seconds += seconds
+        entry = self.calls.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+request_timings: ContextVar[Optional[RequestTimings]] = ContextVar(
+    "request_timings", default=None
+)
+# the interface method being run, to which statements are attributed
+current_function: ContextVar[str] = ContextVar("current_function", default="")
+
+
+@contextmanager
+def timed_call(name: str) -> Iterator[None]:
+    token = current_function.set(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        current_function.reset(token)
+        FUNCTION_CALLS.inc((name,))
+        FUNCTION_SECONDS.inc((name,), seconds)
+        timings = request_timings.get()
+        if timings is not None:
+            timings.add_call(name, seconds)
+
+
+@contextmanager
+def timed_sql(statements: int) -> Iterator[None]:
+    function = current_function.get()
+    if statements and function:
+        FUNCTION_QUERIES.inc((function,), statements)
+    timings = request_timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.sql_count += statements
+        timings.sql_seconds += time.perf_counter() - started
+
+
+def add_render_time(seconds: float) -> None:
+    timings = request_timings.get()
+    if timings is not None:
+        timings.render_seconds += seconds
+
+
+class TimedCursor(psycopg.Cursor[Row]):
+    """Cursor that adds its statements to the current request's timings.
+
+    Fetches are timed as well, since in pipeline mode that is where the
+    round trip is waited for.
+    """
+
+    def execute(
+        self,
+        query: Query,
+        params: Optional[Params] = None,
+        *,
+        prepare: Optional[bool] = None,
+        binary: Optional[bool] = None,
+    ) -> Self:
+        with timed_sql(1):
+            return super().execute(query, params, prepare=prepare, binary=binary)
+
+    def executemany(
+        self, query: Query, params_seq: Iterable[Params], *, returning: bool = False
+    ) -> None:
+        with timed_sql(1):
+            super().executemany(query, params_seq, returning=returning)
+
+    def fetchone(self) -> Optional[Row]:
+        with timed_sql(0):
+            return super().fetchone()
+
+    def fetchmany(self, size: int = 0) -> list[Row]:
+        with timed_sql(0):
+            return super().fetchmany(size)
+
+    def fetchall(self) -> list[Row]:
+        with timed_sql(0):
+            return super().fetchall()
+
+
+class AsyncTimedCursor(psycopg.AsyncCursor[Row]):
+    """Async version of `TimedCursor`."""
+
+    async def execute(
+        self,
+        query: Query,
+        params: Optional[Params] = None,
+        *,
+        prepare: Optional[bool] = None,
+        binary: Optional[bool] = None,
+    ) -> Self:
+        with timed_sql(1):
+            return await super().execute(query, params, prepare=prepare, binary=binary)
+
+    async def executemany(
+        self, query: Query, params_seq: Iterable[Params], *, returning: bool = False
+    ) -> None:
+        with timed_sql(1):
+            await super().executemany(query, params_seq, returning=returning)
+
+    async def fetchone(self) -> Optional[Row]:
+        with timed_sql(0):
+            return await super().fetchone()
+
+    async def fetchmany(self, size: int = 0) -> list[Row]:
+        with timed_sql(0):
+            return await super().fetchmany(size)
+
+    async def fetchall(self) -> list[Row]:
+        with timed_sql(0):
+            return await super().fetchall()
+
+
+def timed_connection_kwargs(use_async: bool) -> dict[str, Any]:
+    """Connection arguments that make every cursor a timed one."""
+    if not REQUEST_TIMING:
+        return {}
+    return {"cursor_factory": AsyncTimedCursor if use_async else TimedCursor}
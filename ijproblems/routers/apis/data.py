@@ -0,0 +1,212 @@
+"""Read-only JSON API for machine consumers.
+
+Lists are returned as {"fields": [...], "rows": [[...], ...]} so that field
+names are not repeated on every row.
+"""
+
+from dataclasses import asdict
+from typing import Any, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import ORJSONResponse
+
+from ijproblems.internal_functions.interface import (
+    AsyncInterfaceInternalFunctions,
+    PageContextQuery,
+    Preference,
+    ProblemInfo,
+    RankingRow,
+)
+from ijproblems.routers.utils.conditional import Validators
+from ijproblems.routers.utils.database import get_functions
+from ijproblems.routers.utils.ranking import page_range
+
+router = APIRouter()
+
+PROBLEM_FIELDS = [
+    "aoj_id",
+    "contest_type",
+    "level",
+    "name",
+    "org",
+    "year",
+    "used_in",
+    "slot",
+    "ja",
+    "en",
+    "likes",
+    "solvers",
+]
+RANKING_FIELDS = [
+    "aoj_userid",
+    "rank",
+    "total_point",
+    "total_solved",
+    "solved_counts",
+]
+MAX_LOCAL_RANKING_USERS = 100
+
+
+def _problem_row(problem: ProblemInfo) -> list[Any]:
+    return [getattr(problem, name) for name in PROBLEM_FIELDS]
+
+
+def _ranking_rows(rows: list[RankingRow]) -> dict[str, Any]:
+    return {
+        "fields": RANKING_FIELDS,
+        "rows": [[getattr(row, name) for name in RANKING_FIELDS] for row in rows],
+    }
+
+
+async def _validators(
+    functions: AsyncInterfaceInternalFunctions, names: list[str], *inputs: Any
+) -> Validators:
+    return Validators.build(await functions.get_data_versions(), names, *inputs)
+
+
+@router.get("/api/problems", response_class=ORJSONResponse, name="api_get_problems")
+async def get_problems(
+    request: Request,
+    contest_type: int = 0,
+    level: int = 0,
+    ja: bool = True,
+    en: bool = True,
+    functions: AsyncInterfaceInternalFunctions = Depends(get_functions),
+) -> Any:
+    """Problems of `contest_type`, of one level if `level > 0`."""
+    if contest_type not in [0, 1]:
+        raise HTTPException(status_code=400)
+
+    validators = await _validators(
+        functions,
+        ["catalog", "crawl"],
+        "api_problems",
+        contest_type,
+        level,
+        ja,
+        en,
+        await functions.get_likes_version(contest_type),
+    )
+    if validators.matches(request):
+        return validators.not_modified(request)
+
+    level_scopes = [0, 0]
+    level_scopes[contest_type] = level
+    preference = Preference(
+        ja=ja,
+        en=en,
+        hide_solved=False,
+        contest_type=contest_type,
+        aoj_userid="",
+        rivals=[],
+        level_scopes=level_scopes,
+    )
+    problems = await functions.get_problems(preference, set())
+
+    content = {
+        "points": functions.get_points(contest_type),
+        "fields": PROBLEM_FIELDS,
+        "rows": [_problem_row(problem) for problem in problems],
+    }
+    return validators.apply(ORJSONResponse(content=content))
+
+
+@router.get(
+    "/api/problems/{aoj_id}", response_class=ORJSONResponse, name="api_get_problem"
+)
+async def get_problem(
+    request: Request,
+    aoj_id: int,
+    functions: AsyncInterfaceInternalFunctions = Depends(get_functions),
+) -> Any:
+    validators = await _validators(
+        functions,
+        ["catalog", "crawl"],
+        "api_problem",
+        aoj_id,
+        await functions.get_problem_likes_version(aoj_id),
+    )
+    if validators.matches(request):
+        return validators.not_modified(request)
+
+    problem = await functions.get_problem(aoj_id)
+    if problem is None:
+        raise HTTPException(status_code=404)
+
+    content = {name: getattr(problem, name) for name in PROBLEM_FIELDS}
+    content["solved_teams"] = problem.solved_teams
+    content["participated_teams"] = problem.participated_teams
+    content["authors"] = problem.authors
+    content["editorials"] = [asdict(editorial) for editorial in problem.editorials]
+    # loaded with the problem, so no second round trip
+    content["solved_user_count"] = problem.solvers
+    return validators.apply(ORJSONResponse(content=content))
+
+
+@router.get(
+    "/api/ranking/{contest_type}",
+    response_class=ORJSONResponse,
+    name="api_get_global_ranking",
+)
+async def get_global_ranking(
+    request: Request,
+    contest_type: int,
+    page: int = 1,
+    functions: AsyncInterfaceInternalFunctions = Depends(get_functions),
+) -> Any:
+    """One page of the global ranking, as on /ranking/{contest_type}/{page}."""
+    if contest_type not in [0, 1] or page < 1:
+        raise HTTPException(status_code=400)
+
+    validators = await _validators(
+        functions, ["catalog", "crawl"], "api_ranking", contest_type, page
+    )
+    if validators.matches(request):
+        return validators.not_modified(request)
+
+    # the rows and the user count in one round trip
+    page_context = await functions.get_page_context(
+        PageContextQuery(
+            contest_type=contest_type,
+            global_ranking_range=page_range(page),
+            user_count=True,
+        )
+    )
+
+    content = {
+        "page": page,
+        "user_count": page_context.user_count,
+        **_ranking_rows(page_context.global_ranking),
+    }
+    return validators.apply(ORJSONResponse(content=content))
+
+
+@router.get(
+    "/api/users/{contest_type}",
+    response_class=ORJSONResponse,
+    name="api_get_users",
+)
+async def get_users(
+    request: Request,
+    contest_type: int,
+    aoj_userids: Optional[str] = None,
+    functions: AsyncInterfaceInternalFunctions = Depends(get_functions),
+) -> Any:
+    """Points of comma-separated `aoj_userids`, like the local ranking."""
+    if contest_type not in [0, 1]:
+        raise HTTPException(status_code=400)
+
+    userids = sorted(
+        set(name.lower() for name in (aoj_userids or "").split(",") if name)
+    )
+    if len(userids) > MAX_LOCAL_RANKING_USERS:
+        raise HTTPException(status_code=400)
+
+    validators = await _validators(
+        functions, ["crawl"], "api_users", contest_type, userids
+    )
+    if validators.matches(request):
+        return validators.not_modified(request)
+
+    rows = await functions.get_user_local_ranking(contest_type, userids)
+    return validators.apply(ORJSONResponse(content=_ranking_rows(rows)))
@@ -1,6 +1,6 @@
 from typing import Any
 
-import requests
+import httpx
 import starlette.status as status
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import RedirectResponse
@@ -8,23 +8,42 @@ from fastapi.responses import RedirectResponse
 from ijproblems.internal_functions.github_app import (
     GITHUB_APP_CLIENT_ID,
     GITHUB_APP_CLIENT_SECRET,
+    GITHUB_OAUTH_URL,
+    GITHUB_USER_URL,
+    get_github_client,
 )
 
 router = APIRouter()
 
 
+async def _send(name: str, request: httpx.Request) -> httpx.Response:
+    try:
+        return await get_github_client().send(request)
+    except httpx.TimeoutException:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=f"{name} timed out"
+        )
+    except httpx.HTTPError:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY, detail=f"{name} is unreachable"
+        )
+
+
 @router.get(
     "/api/github/callback", response_class=RedirectResponse, name="github_callback"
 )
-def github_callback(request: Request, code: str) -> Any:
+async def github_callback(request: Request, code: str) -> Any:
+    client = get_github_client()
     data = {
         "client_id": GITHUB_APP_CLIENT_ID,
         "client_secret": GITHUB_APP_CLIENT_SECRET,
         "code": code,
     }
     headers = {"Accept": "application/json"}
-    oauth_uri = "https://github.com/login/oauth/access_token"
-    response = requests.post(oauth_uri, data=data, headers=headers)
+    response = await _send(
+        "oauth",
+        client.build_request("POST", GITHUB_OAUTH_URL, data=data, headers=headers),
+    )
 
     if response.status_code != 200:
         raise HTTPException(status_code=401, detail="invalid response from oauth")
@@ -35,9 +54,10 @@ def github_callback(request: Request, code: str) -> Any:
     except Exception:
         raise HTTPException(status_code=401, detail="response from oauth is broken")
 
-    user_uri = "https://api.github.com/user"
     headers = {"Authorization": f"Bearer {token}", "Accept": "application/json"}
-    response = requests.get(user_uri, headers=headers)
+    response = await _send(
+        "user", client.build_request("GET", GITHUB_USER_URL, headers=headers)
+    )
 
     if response.status_code != 200:
         raise HTTPException(status_code=401, detail="invalid response from user")
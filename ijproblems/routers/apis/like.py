@@ -1,31 +1,34 @@
-from typing import Any
+from typing import Any, Optional
 
-import psycopg
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import JSONResponse
 
-from ijproblems.internal_functions import get_internal_functions
-from ijproblems.routers.utils.database import get_db_conn
+from ijproblems.internal_functions.interface import GitHubLoginInfo
+from ijproblems.routers.utils.database import get_github_login_info, open_functions
+from ijproblems.routers.utils.likes import like_write_behind
 
 router = APIRouter()
 
 
 @router.post("/api/user/like", response_class=JSONResponse, name="api_post_like")
-def post_like(
-    request: Request,
+async def post_like(
     aoj_id: int,
     value: int,
-    conn: psycopg.Connection = Depends(get_db_conn),
+    github_login_info: Optional[GitHubLoginInfo] = Depends(get_github_login_info),
 ) -> Any:
-    functions = get_internal_functions(conn)
-    github_login_info = functions.get_github_login_info(request)
     if github_login_info is None:
         raise HTTPException(status_code=401)
 
     github_id = github_login_info.github_id
     if value != 0:
         value = 1
-    likes = functions.set_like(github_id, aoj_id, value)
+    if like_write_behind is not None:
+        # the response reports the value of the burst, which the client adopts
+        value, likes = await like_write_behind.set_like(github_id, aoj_id, value)
+    else:
+        # a connection is only checked out for the write itself
+        async with open_functions() as functions:
+            likes = await functions.set_like(github_id, aoj_id, value)
 
     response = {"value": value, "likes": likes}
     return JSONResponse(content=response)
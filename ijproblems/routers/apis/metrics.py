@@ -0,0 +1,142 @@
+from datetime import datetime
+from typing import Any
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from ijproblems.internal_functions.interface import (
+    AsyncInterfaceInternalFunctions,
+    DataVersion,
+)
+from ijproblems.internal_functions.metrics import format_family, render_registry
+from ijproblems.routers.utils.database import get_functions, pool_stats
+
+router = APIRouter()
+
+# (psycopg_pool statistic, metric name, type, description, scale)
+POOL_METRICS = [
+    ("pool_max", "ijproblems_pool_max", "gauge", "Maximum number of connections.", 1),
+    ("pool_size", "ijproblems_pool_size", "gauge", "Open connections.", 1),
+    (
+        "pool_available",
+        "ijproblems_pool_available",
+        "gauge",
+        "Idle connections in the pool.",
+        1,
+    ),
+    (
+        "requests_waiting",
+        "ijproblems_pool_requests_waiting",
+        "gauge",
+        "Requests waiting for a connection.",
+        1,
+    ),
+    (
+        "requests_num",
+        "ijproblems_pool_requests_total",
+        "counter",
+        "Connections requested from the pool.",
+        1,
+    ),
+    (
+        "requests_queued",
+        "ijproblems_pool_requests_queued_total",
+        "counter",
+        "Requests that had to wait for a connection.",
+        1,
+    ),
+    (
+        "requests_wait_ms",
+        "ijproblems_pool_requests_wait_seconds_total",
+        "counter",
+        "Time spent waiting for a connection.",
+        0.001,
+    ),
+    (
+        "requests_errors",
+        "ijproblems_pool_requests_errors_total",
+        "counter",
+        "Requests that got no connection.",
+        1,
+    ),
+    (
+        "connections_lost",
+        "ijproblems_pool_connections_lost_total",
+        "counter",
+        "Connections found broken.",
+        1,
+    ),
+]
+
+
+def _pool_metrics(stats: dict[str, int]) -> str:
+    if not stats:
+        return ""
+    families = [
+        format_family(
+            name, description, kind, [("", (), (), stats.get(key, 0) * scale)]
+        )
+        for key, name, kind, description, scale in POOL_METRICS
+    ]
+    in_use = stats.get("pool_size", 0) - stats.get("pool_available", 0)
+    families.append(
+        format_family(
+            "ijproblems_pool_in_use",
+            "Connections lent to requests.",
+            "gauge",
+            [("", (), (), in_use)],
+        )
+    )
+    return "".join(families)
+
+
+def _data_metrics(versions: dict[str, DataVersion]) -> str:
+    # data_versions timestamps are naive UTC
+    now = datetime.utcnow()
+    names = sorted(versions)
+    families = [
+        format_family(
+            "ijproblems_data_version",
+            "Version of a data set, bumped on every change.",
+            "gauge",
+            [("", ("data",), (name,), versions[name].version) for name in names],
+        ),
+        format_family(
+            "ijproblems_data_age_seconds",
+            "Time since a data set last changed.",
+            "gauge",
+            [
+                (
+                    "",
+                    ("data",),
+                    (name,),
+                    (now - versions[name].updated_at).total_seconds(),
+                )
+                for name in names
+            ],
+        ),
+    ]
+    crawled = versions.get("crawl_run")
+    if crawled is not None:
+        families.append(
+            format_family(
+                "ijproblems_crawl_age_seconds",
+                "Time since the crawler last committed successfully.",
+                "gauge",
+                [("", (), (), (now - crawled.updated_at).total_seconds())],
+            )
+        )
+    return "".join(families)
+
+
+@router.get("/metrics", response_class=PlainTextResponse, name="metrics")
+async def get_metrics(
+    functions: AsyncInterfaceInternalFunctions = Depends(get_functions),
+) -> Any:
+    """Metrics of this worker process in the Prometheus text format."""
+    content = (
+        render_registry()
+        + _pool_metrics(pool_stats())
+        + _data_metrics(await functions.get_data_versions())
+    )
+    return PlainTextResponse(content, media_type="text/plain; version=0.0.4")
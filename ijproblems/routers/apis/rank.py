@@ -0,0 +1,39 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from ijproblems.internal_functions.interface import AsyncInterfaceInternalFunctions
+from ijproblems.routers.pages.ranking import page_of
+from ijproblems.routers.utils.database import get_functions
+
+router = APIRouter()
+
+
+@router.get(
+    "/api/ranking/{contest_type}/{aoj_userid}",
+    response_class=JSONResponse,
+    name="api_get_user_rank",
+)
+async def get_user_rank(
+    request: Request,
+    contest_type: int,
+    aoj_userid: str,
+    functions: AsyncInterfaceInternalFunctions = Depends(get_functions),
+) -> Any:
+    if contest_type not in [0, 1]:
+        raise HTTPException(status_code=400)
+
+    user_rank = await functions.get_user_rank(contest_type, aoj_userid)
+    if user_rank is None:
+        raise HTTPException(status_code=404)
+
+    page = page_of(user_rank.position)
+    url = request.url_for("global_ranking_page", contest_type=contest_type, page=page)
+    response = {
+        "aoj_userid": user_rank.aoj_userid,
+        "rank": user_rank.rank,
+        "page": page,
+        "url": f"{url}#{user_rank.aoj_userid}",
+    }
+    return JSONResponse(content=response)
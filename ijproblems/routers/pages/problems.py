@@ -2,26 +2,28 @@ import datetime
 import json
 from typing import Any, Optional
 
-import psycopg
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
 
-from ijproblems.internal_functions import get_internal_functions
 from ijproblems.internal_functions.github_app import GITHUB_APP_CLIENT_ID
-from ijproblems.internal_functions.interface import Preference
+from ijproblems.internal_functions.interface import (
+    AsyncInterfaceInternalFunctions,
+    PageContextQuery,
+    Preference,
+)
 from ijproblems.routers.utils.cookie import (
     COOKIE_PREFERENCE_KEY,
     get_preference_from_cookie,
 )
-from ijproblems.routers.utils.database import get_db_conn
+from ijproblems.routers.utils.database import get_functions
+from ijproblems.routers.utils.fragments import render_problem_rows
+from ijproblems.routers.utils.templates import stream_template
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
 
 
 @router.get("/", response_class=HTMLResponse, name="problems")
-def get_problems(
+async def get_problems(
     request: Request,
     ja: Optional[bool] = None,
     en: Optional[bool] = None,
@@ -31,7 +33,7 @@ def get_problems(
     contest_type: Optional[int] = None,
     aoj_userid: Optional[str] = None,
     rivals: Optional[str] = None,
-    conn: psycopg.Connection = Depends(get_db_conn),
+    functions: AsyncInterfaceInternalFunctions = Depends(get_functions),
 ) -> Any:
     preference = get_preference_from_cookie(request)
 
@@ -61,44 +63,56 @@ def get_problems(
     if preference.contest_type not in [0, 1]:
         raise HTTPException(status_code=400)
 
-    return _process_request(request, preference, conn)
+    return await _process_request(request, preference, functions)
 
 
-def _process_request(
-    request: Request, preference: Preference, conn: psycopg.Connection
+async def _process_request(
+    request: Request,
+    preference: Preference,
+    functions: AsyncInterfaceInternalFunctions,
 ) -> Any:
-    functions = get_internal_functions(conn)
-    context: dict[str, Any] = {}
-    context["preference"] = preference
-    context["level_lower"] = preference.level_scopes[preference.contest_type]
-    context["points"] = functions.get_points(preference.contest_type)
-    context["total_row"] = functions.get_problems_total_row(preference.contest_type)
+    github_login_info = functions.get_github_login_info(request)
 
     userids = set(name.lower() for name in preference.rivals)
     if preference.aoj_userid:
         userids.add(preference.aoj_userid.lower())
-    context["local_ranking"] = functions.get_user_local_ranking(
-        preference.contest_type, list(userids)
+
+    page_context = await functions.get_page_context(
+        PageContextQuery(
+            contest_type=preference.contest_type,
+            total_row=True,
+            local_ranking_userids=list(userids),
+            solved_problems_userid=preference.aoj_userid,
+            problems_preference=preference,
+            likes_github_id=(
+                github_login_info.github_id if github_login_info is not None else None
+            ),
+        )
     )
 
-    user_solved_problems = functions.get_user_solved_problems(preference.aoj_userid)
-    context["user_solved_problems"] = user_solved_problems
-    context["problems"] = functions.get_problems(preference, user_solved_problems)
+    context: dict[str, Any] = {}
+    context["preference"] = preference
+    context["level_lower"] = preference.level_scopes[preference.contest_type]
+    context["points"] = functions.get_points(preference.contest_type)
+    context["total_row"] = page_context.total_row
+    context["local_ranking"] = page_context.local_ranking
+    context["user_solved_problems"] = page_context.user_solved_problems
+    context["problems"] = page_context.problems
 
-    github_login_info = functions.get_github_login_info(request)
     context["github_login_info"] = github_login_info
     context["github_app_client_id"] = GITHUB_APP_CLIENT_ID
-
-    if github_login_info is not None:
-        context["user_likes"] = functions.get_likes(github_login_info.github_id)
-    else:
-        context["user_likes"] = set()
-
-    response = templates.TemplateResponse(
-        request=request,
-        name="problems.html",
-        context=context,
+    context["user_likes"] = page_context.user_likes
+    context["problem_rows"] = render_problem_rows(
+        request,
+        page_context.problems,
+        page_context.user_solved_problems,
+        page_context.user_likes,
+        preference,
+        context["points"],
+        github_login_info,
     )
+
+    response = stream_template(request, "problems.html", context)
     expires = datetime.datetime(2100, 1, 1, tzinfo=datetime.timezone.utc)
     response.set_cookie(
         COOKIE_PREFERENCE_KEY, json.dumps(preference.__dict__), expires=expires
@@ -1,18 +1,22 @@
 from dataclasses import dataclass
 from typing import Any
 
-import psycopg
 from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse, RedirectResponse
 
-from ijproblems.internal_functions import get_internal_functions
 from ijproblems.internal_functions.github_app import GITHUB_APP_CLIENT_ID
+from ijproblems.internal_functions.interface import (
+    AsyncInterfaceInternalFunctions,
+    PageContextQuery,
+)
+from ijproblems.routers.utils.conditional import Validators
 from ijproblems.routers.utils.cookie import get_preference_from_cookie
-from ijproblems.routers.utils.database import get_db_conn
+from ijproblems.routers.utils.database import get_functions
+from ijproblems.routers.utils.fragments import fragment_cache, render_fragment
+from ijproblems.routers.utils.ranking import USERS_IN_ONE_PAGE, page_of, page_range
+from ijproblems.routers.utils.templates import stream_template
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
 
 
 @dataclass
@@ -21,17 +25,16 @@ class Page:
     selected: bool
 
 
-USERS_IN_ONE_PAGE = 200
-
-
 @router.get("/ranking/", response_class=HTMLResponse, name="global_ranking")
-def get_global_ranking(
+async def get_global_ranking(
     request: Request,
-    conn: psycopg.Connection = Depends(get_db_conn),
+    functions: AsyncInterfaceInternalFunctions = Depends(get_functions),
 ) -> Any:
     preference = get_preference_from_cookie(request)
     page = 1
-    return get_global_ranking_page(request, preference.contest_type, page, conn)
+    return await get_global_ranking_page(
+        request, preference.contest_type, page, functions
+    )
 
 
 @router.get(
@@ -39,41 +42,105 @@ def get_global_ranking(
     response_class=HTMLResponse,
     name="global_ranking_page",
 )
-def get_global_ranking_page(
+async def get_global_ranking_page(
     request: Request,
     contest_type: int,
     page: int,
-    conn: psycopg.Connection = Depends(get_db_conn),
+    functions: AsyncInterfaceInternalFunctions = Depends(get_functions),
 ) -> Any:
     if contest_type not in [0, 1]:
         raise HTTPException(status_code=400)
 
-    functions = get_internal_functions(conn)
-    context: dict[str, Any] = {}
-
     preference = get_preference_from_cookie(request)
     preference.contest_type = contest_type
+    github_login_info = functions.get_github_login_info(request)
+
+    versions = await functions.get_data_versions()
+    validators = Validators.build(
+        versions,
+        ["catalog", "crawl"],
+        "global_ranking",
+        contest_type,
+        page,
+        preference,
+        github_login_info,
+    )
+    if validators.matches(request):
+        return validators.not_modified(request)
+
+    # the rows only change with the data, so a cached page skips its query
+    ranking_rows_key = (
+        "global_ranking_rows",
+        str(request.base_url),
+        contest_type,
+        page,
+        versions.get("catalog"),
+        versions.get("crawl"),
+    )
+    ranking_rows = fragment_cache.get(ranking_rows_key)
+
+    page_context = await functions.get_page_context(
+        PageContextQuery(
+            contest_type=contest_type,
+            total_row=True,
+            global_ranking_range=page_range(page) if ranking_rows is None else None,
+            user_count=True,
+        )
+    )
+    if ranking_rows is None:
+        ranking_rows = fragment_cache.get_or_render(
+            ranking_rows_key,
+            lambda: render_fragment(
+                request,
+                "global_ranking/ranking_rows.html",
+                {
+                    "ranking": page_context.global_ranking,
+                    "contest_type": contest_type,
+                    "total_row": page_context.total_row,
+                },
+            ),
+        )
+
+    context: dict[str, Any] = {}
     context["preference"] = preference
 
     context["contest_type"] = contest_type
     context["points"] = functions.get_points(contest_type)
-    context["total_row"] = functions.get_problems_total_row(contest_type)
-    begin = (page - 1) * USERS_IN_ONE_PAGE + 1
-    end = page * USERS_IN_ONE_PAGE
-    context["ranking"] = functions.get_global_ranking(contest_type, begin, end)
-    context["rank_begin"] = begin
-    max_pages = functions.get_user_count(contest_type) // USERS_IN_ONE_PAGE + 1
+    context["total_row"] = page_context.total_row
+    context["ranking_rows"] = ranking_rows
+    max_pages = page_context.user_count // USERS_IN_ONE_PAGE + 1
     context["pages"] = [
         Page(page=p, selected=p == page) for p in range(1, max_pages + 1)
     ]
 
-    github_login_info = functions.get_github_login_info(request)
     context["github_login_info"] = github_login_info
     context["github_app_client_id"] = GITHUB_APP_CLIENT_ID
 
-    response = templates.TemplateResponse(
-        request=request,
-        name="global_ranking.html",
-        context=context,
+    response = stream_template(request, "global_ranking.html", context)
+    return validators.apply(response)
+
+
+@router.get(
+    "/ranking/{contest_type}/user/{aoj_userid}",
+    response_class=RedirectResponse,
+    name="global_ranking_user",
+)
+async def get_global_ranking_user(
+    request: Request,
+    contest_type: int,
+    aoj_userid: str,
+    functions: AsyncInterfaceInternalFunctions = Depends(get_functions),
+) -> Any:
+    if contest_type not in [0, 1]:
+        raise HTTPException(status_code=400)
+
+    user_rank = await functions.get_user_rank(contest_type, aoj_userid)
+    if user_rank is None:
+        raise HTTPException(status_code=404)
+
+    url = request.url_for(
+        "global_ranking_page",
+        contest_type=contest_type,
+        page=page_of(user_rank.position),
     )
-    return response
+    return RedirectResponse(url=f"{url}#{user_rank.aoj_userid}", status_code=303)
@@ -1,34 +1,60 @@
 from typing import Any
 
-import psycopg
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
 
-from ijproblems.internal_functions import get_internal_functions
 from ijproblems.internal_functions.github_app import GITHUB_APP_CLIENT_ID
+from ijproblems.internal_functions.interface import (
+    AsyncInterfaceInternalFunctions,
+    PageContextQuery,
+)
+from ijproblems.routers.utils.conditional import Validators
 from ijproblems.routers.utils.cookie import get_preference_from_cookie
-from ijproblems.routers.utils.database import get_db_conn
+from ijproblems.routers.utils.database import get_functions
+from ijproblems.routers.utils.templates import templates
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
 
 
 @router.get("/problem/{aoj_id}", response_class=HTMLResponse, name="statistics")
-def get_problems(
+async def get_problems(
     request: Request,
     aoj_id: int,
-    conn: psycopg.Connection = Depends(get_db_conn),
+    functions: AsyncInterfaceInternalFunctions = Depends(get_functions),
 ) -> Any:
-    functions = get_internal_functions(conn)
+    github_login_info = functions.get_github_login_info(request)
+    preference = get_preference_from_cookie(request)
+
+    validators = Validators.build(
+        await functions.get_data_versions(),
+        ["catalog", "crawl"],
+        "statistics",
+        aoj_id,
+        preference,
+        github_login_info,
+        await functions.get_problem_likes_version(aoj_id),
+    )
+    if validators.matches(request):
+        return validators.not_modified(request)
+
+    page_context = await functions.get_page_context(
+        PageContextQuery(
+            problem_aoj_id=aoj_id,
+            solved_problems_userid=preference.aoj_userid,
+            likes_github_id=(
+                github_login_info.github_id if github_login_info is not None else None
+            ),
+        )
+    )
+
     context: dict[str, Any] = {}
 
-    problem = functions.get_problem(aoj_id)
+    problem = page_context.problem
     if problem is None:
         raise HTTPException(status_code=400)
     context["problem"] = problem
     context["points"] = functions.get_points(problem.contest_type)
-    context["problem_solved_user_count"] = functions.get_solved_user_count(aoj_id)
+    context["problem_solved_user_count"] = page_context.problem_solved_user_count
 
     if problem.contest_type == 0:
         if problem.org == "Official":
@@ -45,23 +71,16 @@ def get_problems(
             contest = f"JAG {problem.used_in} Contest"
     context["contest"] = contest
 
-    github_login_info = functions.get_github_login_info(request)
     context["github_login_info"] = github_login_info
     context["github_app_client_id"] = GITHUB_APP_CLIENT_ID
+    context["user_likes"] = page_context.user_likes
 
-    if github_login_info is not None:
-        context["user_likes"] = functions.get_likes(github_login_info.github_id)
-    else:
-        context["user_likes"] = set()
-
-    preference = get_preference_from_cookie(request)
     context["preference"] = preference
-    user_solved_problems = functions.get_user_solved_problems(preference.aoj_userid)
-    context["user_solved_problems"] = user_solved_problems
+    context["user_solved_problems"] = page_context.user_solved_problems
 
     response = templates.TemplateResponse(
         request=request,
         name="statistics.html",
         context=context,
     )
-    return response
+    return validators.apply(response)
@@ -1,39 +1,46 @@
 from typing import Any
 
-import psycopg
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
 
-from ijproblems.internal_functions import get_internal_functions
 from ijproblems.internal_functions.github_app import GITHUB_APP_CLIENT_ID
-from ijproblems.internal_functions.interface import Preference
-from ijproblems.routers.utils.database import get_db_conn
+from ijproblems.internal_functions.interface import (
+    AsyncInterfaceInternalFunctions,
+    PageContextQuery,
+    Preference,
+)
+from ijproblems.routers.utils.conditional import Validators
+from ijproblems.routers.utils.database import get_functions
+from ijproblems.routers.utils.fragments import render_problem_rows
+from ijproblems.routers.utils.templates import stream_template
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
 
 
 @router.get(
     "/user/{aoj_userid}/{contest_type}", response_class=HTMLResponse, name="user"
 )
-def get_problems(
+async def get_problems(
     request: Request,
     aoj_userid: str,
     contest_type: int,
-    conn: psycopg.Connection = Depends(get_db_conn),
+    functions: AsyncInterfaceInternalFunctions = Depends(get_functions),
 ) -> Any:
     if contest_type not in [0, 1]:
         raise HTTPException(status_code=400)
-    functions = get_internal_functions(conn)
-    context: dict[str, Any] = {}
-
-    context["points"] = functions.get_points(contest_type)
-    context["total_row"] = functions.get_problems_total_row(contest_type)
+    github_login_info = functions.get_github_login_info(request)
 
-    context["local_ranking"] = functions.get_user_local_ranking(
-        contest_type, [aoj_userid]
+    validators = Validators.build(
+        await functions.get_data_versions(),
+        ["catalog", "crawl"],
+        "user",
+        aoj_userid,
+        contest_type,
+        github_login_info,
+        await functions.get_likes_version(contest_type),
     )
+    if validators.matches(request):
+        return validators.not_modified(request)
 
     fixed_preference = Preference(
         ja=True,
@@ -45,24 +52,40 @@ def get_problems(
         level_scopes=[1, 1],
     )
 
-    user_solved_problems = functions.get_user_solved_problems(aoj_userid)
-    context["user_solved_problems"] = user_solved_problems
-    context["problems"] = functions.get_problems(fixed_preference, user_solved_problems)
+    page_context = await functions.get_page_context(
+        PageContextQuery(
+            contest_type=contest_type,
+            total_row=True,
+            local_ranking_userids=[aoj_userid],
+            solved_problems_userid=aoj_userid,
+            problems_preference=fixed_preference,
+            likes_github_id=(
+                github_login_info.github_id if github_login_info is not None else None
+            ),
+        )
+    )
+
+    context: dict[str, Any] = {}
+    context["points"] = functions.get_points(contest_type)
+    context["total_row"] = page_context.total_row
+    context["local_ranking"] = page_context.local_ranking
+    context["user_solved_problems"] = page_context.user_solved_problems
+    context["problems"] = page_context.problems
     context["preference"] = fixed_preference
     context["level_lower"] = 1
 
-    github_login_info = functions.get_github_login_info(request)
     context["github_login_info"] = github_login_info
     context["github_app_client_id"] = GITHUB_APP_CLIENT_ID
-
-    if github_login_info is not None:
-        context["user_likes"] = functions.get_likes(github_login_info.github_id)
-    else:
-        context["user_likes"] = set()
-
-    response = templates.TemplateResponse(
-        request=request,
-        name="user.html",
-        context=context,
+    context["user_likes"] = page_context.user_likes
+    context["problem_rows"] = render_problem_rows(
+        request,
+        page_context.problems,
+        page_context.user_solved_problems,
+        page_context.user_likes,
+        fixed_preference,
+        context["points"],
+        github_login_info,
     )
-    return response
+
+    response = stream_template(request, "user.html", context)
+    return validators.apply(response)
@@ -0,0 +1,106 @@
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from pathlib import Path
+from typing import Any, Optional
+
+from fastapi import Request, Response
+
+from ijproblems.internal_functions.interface import DataVersion
+from ijproblems.routers.utils.templates import TEMPLATE_DIRECTORY
+
+
+def _digest_templates(directory: str) -> str:
+    # a deploy that changes the markup must not be answered with 304
+    digest = hashlib.sha256()
+    for path in sorted(Path(directory).rglob("*.html")):
+        digest.update(str(path).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+TEMPLATE_DIGEST = _digest_templates(TEMPLATE_DIRECTORY)
+
+
+@dataclass(frozen=True)
+class Validators:
+    """ETag and Last-Modified of a page rendered from versioned data."""
+
+    etag: str
+    last_modified: datetime
+
+    @classmethod
+    def build(
+        cls, versions: dict[str, DataVersion], names: list[str], *inputs: Any
+    ) -> "Validators":
+        """Validators of a page made from the data sets `names` and `inputs`.
+
+        `inputs` must cover everything else the page depends on (path
+        parameters, preference, login) and have a stable `repr`.
+        """
+        used = [versions.get(name) for name in names]
+        digest = hashlib.sha256(
+            repr(
+                (
+                    TEMPLATE_DIGEST,
+                    [version.version if version else 0 for version in used],
+                    inputs,
+                )
+            ).encode()
+        ).hexdigest()
+        last_modified = max(
+            (version.updated_at for version in used if version is not None),
+            default=datetime(1970, 1, 1),
+        )
+        return Validators(etag=f'"{digest[:32]}"', last_modified=last_modified)
+
+    def headers(self) -> dict[str, str]:
+        return {
+            "ETag": self.etag,
+            "Last-Modified": format_datetime(
+                self.last_modified.replace(tzinfo=timezone.utc), usegmt=True
+            ),
+            # pages depend on the preference and session cookies
+            "Cache-Control": "no-cache",
+            "Vary": "Cookie",
+        }
+
+    def _gzip_etag(self) -> str:
+        # a strong ETag must differ between content codings
+        return self.etag[:-1] + '-gzip"'
+
+    def _matched_etag(self, request: Request) -> Optional[str]:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is None:
+            return None
+        for tag in if_none_match.split(","):
+            tag = tag.strip().removeprefix("W/")
+            if tag == "*":
+                return self.etag
+            if tag in (self.etag, self._gzip_etag()):
+                return tag
+        return None
+
+    def matches(self, request: Request) -> bool:
+        """Whether the client already holds this version of the page.
+
+        Only `If-None-Match` is honored; `Last-Modified` does not capture
+        cookie inputs, so `If-Modified-Since` alone is not enough.
+        """
+        return self._matched_etag(request) is not None
+
+    def not_modified(self, request: Request) -> Response:
+        headers = self.headers()
+        headers["ETag"] = self._matched_etag(request) or self.etag
+        return Response(status_code=304, headers=headers)
+
+    def apply(self, response: Response) -> Response:
+        headers = self.headers()
+        if response.headers.get("content-encoding") == "gzip":
+            headers["ETag"] = self._gzip_etag()
+        vary = response.headers.get("vary")
+        if vary:
+            headers["Vary"] = f"{vary}, {headers['Vary']}"
+        response.headers.update(headers)
+        return response
@@ -1,26 +1,243 @@
+import asyncio
+import logging
 import os
-from typing import Generator
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, AsyncIterator, Optional
 
 import psycopg
-from psycopg_pool import ConnectionPool
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from psycopg.pq import TransactionStatus
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
+
+from ijproblems.internal_functions import (
+    get_async_internal_functions,
+    get_internal_functions,
+)
+from ijproblems.internal_functions.instrumented import InstrumentedInternalFunctions
+from ijproblems.internal_functions.interface import (
+    AsyncInterfaceInternalFunctions,
+    GitHubLoginInfo,
+    session_github_login_info,
+)
+from ijproblems.internal_functions.invalidation import (
+    INVALIDATION_LISTEN,
+    InvalidationListener,
+    invalidation_bus,
+)
+from ijproblems.internal_functions.metrics import POOL_ACQUIRE_SECONDS
+from ijproblems.internal_functions.queries import hot_queries
+from ijproblems.internal_functions.threaded import ThreadedInternalFunctions
+from ijproblems.internal_functions.timing import REQUEST_TIMING, timed_connection_kwargs
+
+logger = logging.getLogger(__name__)
+
+USE_MOCK = bool(os.environ.get("USE_MOCK"))
+USE_ASYNC_DB = bool(os.environ.get("USE_ASYNC_DB"))
+
+# a full DSN overrides the POSTGRES_* parts
+POSTGRES_URL = os.environ.get("POSTGRES_URL", "")
+POOL_MIN_SIZE = int(os.environ.get("POOL_MIN_SIZE", "4"))
+POOL_MAX_SIZE = int(os.environ.get("POOL_MAX_SIZE", "10"))
+# how long a request waits for a connection before failing
+POOL_TIMEOUT_SECOND = float(os.environ.get("POOL_TIMEOUT_SECOND", "10"))
+POOL_MAX_LIFETIME_SECOND = float(os.environ.get("POOL_MAX_LIFETIME_SECOND", "3600"))
+POOL_MAX_IDLE_SECOND = float(os.environ.get("POOL_MAX_IDLE_SECOND", "600"))
+# executions of a statement before psycopg prepares it; negative disables
+POSTGRES_PREPARE_THRESHOLD = int(os.environ.get("POSTGRES_PREPARE_THRESHOLD", "0"))
 
 
 def get_postgres_url() -> str:
+    if POSTGRES_URL:
+        return POSTGRES_URL
     user = os.environ["POSTGRES_USER"]
     password = os.environ["POSTGRES_PASSWORD"]
-    hostname = "postgres"
-    port = 5432
+    hostname = os.environ.get("POSTGRES_HOST", "postgres")
+    port = int(os.environ.get("POSTGRES_PORT", "5432"))
     dbname = os.environ["POSTGRES_DB"]
     url = f"postgres://{user}:{password}@{hostname}:{port}/{dbname}"
     return url
 
 
-_pool = ConnectionPool(get_postgres_url())
+def _prepare_hot_queries(conn: psycopg.Connection) -> None:
+    # new connections come with the hot statements already planned
+    for query in hot_queries():
+        conn.execute(query.sql, query.params, prepare=True)
+    # psycopg deallocates prepared statements on rollback
+    conn.commit()
+
+
+async def _async_prepare_hot_queries(conn: psycopg.AsyncConnection) -> None:
+    for query in hot_queries():
+        await conn.execute(query.sql, query.params, prepare=True)
+    await conn.commit()
+
+
+def _connection_kwargs(use_async: bool) -> dict[str, Any]:
+    return {
+        "prepare_threshold": (
+            POSTGRES_PREPARE_THRESHOLD if POSTGRES_PREPARE_THRESHOLD >= 0 else None
+        ),
+        **timed_connection_kwargs(use_async),
+    }
+
+
+# at most one of the pools exists, none with mock data; they are opened by
+# `open_pools` in the app lifespan
+_pool: Optional[ConnectionPool] = None
+_async_pool: Optional[AsyncConnectionPool] = None
+if USE_MOCK:
+    pass
+elif USE_ASYNC_DB:
+    _async_pool = AsyncConnectionPool(
+        get_postgres_url(),
+        min_size=POOL_MIN_SIZE,
+        max_size=POOL_MAX_SIZE,
+        timeout=POOL_TIMEOUT_SECOND,
+        max_lifetime=POOL_MAX_LIFETIME_SECOND,
+        max_idle=POOL_MAX_IDLE_SECOND,
+        kwargs=_connection_kwargs(use_async=True),
+        configure=_async_prepare_hot_queries,
+        open=False,
+    )
+else:
+    _pool = ConnectionPool(
+        get_postgres_url(),
+        min_size=POOL_MIN_SIZE,
+        max_size=POOL_MAX_SIZE,
+        timeout=POOL_TIMEOUT_SECOND,
+        max_lifetime=POOL_MAX_LIFETIME_SECOND,
+        max_idle=POOL_MAX_IDLE_SECOND,
+        kwargs=_connection_kwargs(use_async=False),
+        configure=_prepare_hot_queries,
+        open=False,
+    )
 
 
-def get_db_conn() -> Generator[psycopg.Connection, None, None]:
-    conn = _pool.getconn()
+# keeps the caches of this worker in step with the database
+_invalidation_listener: Optional[InvalidationListener] = None
+if not USE_MOCK and INVALIDATION_LISTEN:
+    _invalidation_listener = InvalidationListener(get_postgres_url(), invalidation_bus)
+
+
+async def open_pools() -> None:
+    """Open the pool and wait until its minimum connections are ready.
+
+    If the database is not reachable in time, the app still starts and the
+    pool keeps connecting in the background.
+    """
+    if _pool is not None:
+        _pool.open()
+    if _async_pool is not None:
+        await _async_pool.open()
+    if _pool is None and _async_pool is None:
+        return
+
+    # `open(wait=True)` would close the pool on a timeout
+    deadline = time.monotonic() + POOL_TIMEOUT_SECOND
+    while pool_stats().get("pool_available", 0) < POOL_MIN_SIZE:
+        if time.monotonic() >= deadline:
+            logger.warning("connection pool is not ready; still connecting")
+            return
+        await asyncio.sleep(0.05)
+
+
+async def close_pools() -> None:
+    if _pool is not None:
+        await run_in_threadpool(_pool.close)
+    if _async_pool is not None:
+        await _async_pool.close()
+
+
+async def load_solved_index() -> None:
+    """Build the solved index before the first request needs it.
+
+    If the database is not reachable, the first request builds it instead.
+    """
+    if USE_MOCK:
+        return
     try:
-        yield conn
-    finally:
-        _pool.putconn(conn)
+        async with open_functions() as functions:
+            await functions.refresh_solved_index()
+    except psycopg.Error as e:
+        logger.warning(f"solved index is not loaded: {e}")
+
+
+def start_listeners() -> None:
+    if _invalidation_listener is not None:
+        _invalidation_listener.start()
+
+
+async def stop_listeners() -> None:
+    if _invalidation_listener is not None:
+        await _invalidation_listener.stop()
+
+
+def _release(conn: psycopg.Connection, succeeded: bool) -> None:
+    assert _pool is not None
+    # reads leave a transaction open; a rollback would also deallocate the
+    # prepared statements, so the transaction of a finished request is
+    # committed instead
+    if conn.info.transaction_status == TransactionStatus.INTRANS:
+        if succeeded:
+            conn.commit()
+        else:
+            conn.rollback()
+    _pool.putconn(conn)
+
+
+def pool_stats() -> dict[str, int]:
+    """Statistics of the connection pool; empty with mock data."""
+    if _pool is not None:
+        return _pool.get_stats()
+    if _async_pool is not None:
+        return _async_pool.get_stats()
+    return {}
+
+
+def _instrument(
+    functions: AsyncInterfaceInternalFunctions,
+) -> AsyncInterfaceInternalFunctions:
+    if REQUEST_TIMING:
+        return InstrumentedInternalFunctions(functions)
+    return functions
+
+
+@asynccontextmanager
+async def open_functions() -> AsyncIterator[AsyncInterfaceInternalFunctions]:
+    """Functions on a database session of their own.
+
+    The transaction is committed if the block succeeds, else rolled back.
+    """
+    if USE_MOCK:
+        yield _instrument(get_async_internal_functions())
+        return
+
+    if _async_pool is not None:
+        yield _instrument(get_async_internal_functions(_async_pool))
+        return
+
+    assert _pool is not None
+    started = time.perf_counter()
+    conn = await run_in_threadpool(_pool.getconn)
+    POOL_ACQUIRE_SECONDS.observe(time.perf_counter() - started)
+    try:
+        yield _instrument(ThreadedInternalFunctions(get_internal_functions(conn)))
+    except BaseException:
+        await run_in_threadpool(_release, conn, False)
+        raise
+    await run_in_threadpool(_release, conn, True)
+
+
+async def get_functions() -> AsyncGenerator[AsyncInterfaceInternalFunctions, None]:
+    async with open_functions() as functions:
+        yield functions
+
+
+def get_github_login_info(request: Request) -> Optional[GitHubLoginInfo]:
+    """Login of the request, without checking out a connection."""
+    if USE_MOCK:
+        # the mock may log in a dummy user
+        return get_async_internal_functions().get_github_login_info(request)
+    return session_github_login_info(request)
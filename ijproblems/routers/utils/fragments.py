@@ -0,0 +1,127 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import AbstractSet, Any, Callable, Hashable, Optional
+
+from fastapi import Request
+from markupsafe import Markup
+
+from ijproblems.internal_functions.interface import (
+    GitHubLoginInfo,
+    Preference,
+    ProblemInfo,
+)
+from ijproblems.routers.utils.templates import templates
+
+FRAGMENT_CACHE_MAX_BYTES = int(
+    os.environ.get("FRAGMENT_CACHE_MAX_BYTES", str(32 * 1024 * 1024))
+)
+
+
+class FragmentCache:
+    """LRU cache of rendered HTML fragments, bounded by their total UTF-8 size.
+
+    Keys must contain everything a fragment depends on, including the base
+    URL since fragments contain absolute links.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # each fragment with its size in bytes
+        self._fragments: OrderedDict[Hashable, tuple[Markup, int]] = OrderedDict()
+        self._size = 0
+
+    def get(self, key: Hashable) -> Optional[Markup]:
+        with self._lock:
+            entry = self._fragments.get(key)
+            if entry is None:
+                return None
+            self._fragments.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Hashable, fragment: Markup) -> None:
+        # titles in Japanese take several bytes per character
+        size = len(fragment.encode())
+        with self._lock:
+            old = self._fragments.pop(key, None)
+            if old is not None:
+                self._size -= old[1]
+            if size > self.max_bytes:
+                return
+            self._fragments[key] = (fragment, size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _key, (_evicted, evicted_size) = self._fragments.popitem(last=False)
+                self._size -= evicted_size
+
+    def get_or_render(self, key: Hashable, render: Callable[[], str]) -> Markup:
+        fragment = self.get(key)
+        if fragment is None:
+            fragment = Markup(render())
+            self.put(key, fragment)
+        return fragment
+
+
+fragment_cache = FragmentCache(FRAGMENT_CACHE_MAX_BYTES)
+
+
+def render_fragment(request: Request, name: str, context: dict[str, Any]) -> str:
+    return templates.get_template(name).render({"request": request, **context})
+
+
+def render_problem_rows(
+    request: Request,
+    problems: list[ProblemInfo],
+    user_solved_problems: AbstractSet[int],
+    user_likes: AbstractSet[int],
+    preference: Preference,
+    points: list[int],
+    github_login_info: Optional[GitHubLoginInfo],
+) -> Markup:
+    """Rows of the problem table, each cached by what it displays.
+
+    The solved and liked decorations are part of the key, so a user's table
+    is assembled from rows shared with every other user.
+    """
+    base_url = str(request.base_url)
+    logged_in = github_login_info is not None
+    rows = []
+    for problem in problems:
+        solved = problem.aoj_id in user_solved_problems
+        liked = problem.aoj_id in user_likes
+        key = (
+            "problem_row",
+            base_url,
+            preference.contest_type,
+            logged_in,
+            solved,
+            liked,
+            problem.aoj_id,
+            problem.level,
+            problem.likes,
+            problem.solvers,
+            problem.ja,
+            problem.en,
+            problem.name,
+            problem.org,
+            problem.year,
+        )
+        rows.append(
+            fragment_cache.get_or_render(
+                key,
+                lambda: render_fragment(
+                    request,
+                    "problems/problem_row.html",
+                    {
+                        "problem": problem,
+                        "solved": solved,
+                        "liked": liked,
+                        "preference": preference,
+                        "points": points,
+                        "github_login_info": github_login_info,
+                    },
+                ),
+            )
+        )
+    return Markup("").join(rows)
@@ -0,0 +1,72 @@
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from ijproblems.routers.utils.database import open_functions
+
+logger = logging.getLogger(__name__)
+
+# toggles of one user and problem closer than this are written once; 0 disables
+LIKE_WRITE_BEHIND_SECOND = float(os.environ.get("LIKE_WRITE_BEHIND_SECOND", "0"))
+
+
+class _Burst:
+    def __init__(self, value: int) -> None:
+        self.value = value
+        # the value written and the like count after it
+        self.result: asyncio.Future[tuple[int, int]] = (
+            asyncio.get_running_loop().create_future()
+        )
+
+
+class LikeWriteBehind:
+    """Coalesces rapid like toggles of the same user and problem.
+
+    The first toggle starts a burst that is written `window_second` later
+    with the last value set in the meantime; every request of the burst
+    gets that value and the like count after the single write. The write
+    runs on its own database session, so a request that goes away does not
+    lose it, and no request holds a connection while it waits.
+    """
+
+    def __init__(self, window_second: float) -> None:
+        self.window_second = window_second
+        self._bursts: dict[tuple[int, int], _Burst] = {}
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def set_like(
+        self, github_id: int, aoj_id: int, value: int
+    ) -> tuple[int, int]:
+        key = (github_id, aoj_id)
+        burst = self._bursts.get(key)
+        if burst is None:
+            burst = _Burst(value)
+            self._bursts[key] = burst
+            task = asyncio.create_task(self._write(key, burst))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            burst.value = value
+        return await asyncio.shield(burst.result)
+
+    async def _write(self, key: tuple[int, int], burst: _Burst) -> None:
+        await asyncio.sleep(self.window_second)
+        # toggles from now on start the next burst
+        del self._bursts[key]
+        github_id, aoj_id = key
+        try:
+            async with open_functions() as functions:
+                likes = await functions.set_like(github_id, aoj_id, burst.value)
+        except Exception as e:
+            logger.exception(f"like write of {key} failed")
+            burst.result.set_exception(e)
+            # the requests of the burst may all have gone away
+            burst.result.exception()
+        else:
+            burst.result.set_result((burst.value, likes))
+
+
+like_write_behind: Optional[LikeWriteBehind] = (
+    LikeWriteBehind(LIKE_WRITE_BEHIND_SECOND) if LIKE_WRITE_BEHIND_SECOND > 0 else None
+)
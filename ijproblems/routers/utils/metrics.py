@@ -0,0 +1,43 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ijproblems.internal_functions.metrics import REQUEST_SECONDS
+
+
+class MetricsMiddleware:
+    """Observes the latency of every request, labeled by its route template.
+
+    Paths that match no route share one label, so that scanners cannot
+    create unbounded series.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_metrics(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                (
+                    scope["method"],
+                    getattr(route, "path", "unmatched"),
+                    str(status),
+                ),
+            )
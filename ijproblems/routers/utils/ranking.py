@@ -0,0 +1,10 @@
+USERS_IN_ONE_PAGE = 200
+
+
+def page_of(position: int) -> int:
+    return (position - 1) // USERS_IN_ONE_PAGE + 1
+
+
+def page_range(page: int) -> tuple[int, int]:
+    """First and last positions of the global ranking shown on `page`."""
+    return (page - 1) * USERS_IN_ONE_PAGE + 1, page * USERS_IN_ONE_PAGE
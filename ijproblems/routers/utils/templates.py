@@ -0,0 +1,127 @@
+import os
+import time
+import zlib
+from typing import Any, Iterator, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, Template
+
+from ijproblems.internal_functions.timing import add_render_time
+
+TEMPLATE_DIRECTORY = "templates"
+
+# compiled templates are shared by all workers on a host through this
+# directory; the system temporary directory is used if it is not set
+JINJA_BYTECODE_CACHE_DIR: Optional[str] = (
+    os.environ.get("JINJA_BYTECODE_CACHE_DIR") or None
+)
+
+# the first chunk is sent early so that the browser can start on the <head>
+STREAM_FIRST_CHUNK_BYTES = 2048
+STREAM_CHUNK_BYTES = 16384
+# 0 disables on-the-fly compression of streamed pages
+STREAM_GZIP_LEVEL = int(os.environ.get("STREAM_GZIP_LEVEL", "6"))
+
+
+class TimedTemplate(Template):
+    """Template whose rendering counts as render time of the request."""
+
+    def render(self, *args: Any, **kwargs: Any) -> str:
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            add_render_time(time.perf_counter() - started)
+
+
+def _create_environment() -> Environment:
+    if JINJA_BYTECODE_CACHE_DIR is not None:
+        os.makedirs(JINJA_BYTECODE_CACHE_DIR, exist_ok=True)
+    environment = Environment(
+        loader=FileSystemLoader(TEMPLATE_DIRECTORY),
+        autoescape=True,
+        bytecode_cache=FileSystemBytecodeCache(JINJA_BYTECODE_CACHE_DIR),
+        # checking template mtimes on every render is only useful in development
+        auto_reload=bool(os.environ.get("FASTAPI_RELOAD")),
+    )
+    environment.template_class = TimedTemplate
+    return environment
+
+
+templates = Jinja2Templates(env=_create_environment())
+
+
+def warm_up_templates() -> int:
+    """Compile every template, so that no request pays for it.
+
+    Returns the number of templates compiled.
+    """
+    names = templates.env.list_templates(extensions=["html"])
+    for name in names:
+        templates.env.get_template(name)
+    return len(names)
+
+
+def _chunks(pieces: Iterator[str]) -> Iterator[bytes]:
+    # Jinja yields many tiny strings; batch them into reasonably sized chunks.
+    # Rendering is timed per chunk, as timing every piece would cost more.
+    buffer: list[str] = []
+    size = 0
+    limit = STREAM_FIRST_CHUNK_BYTES
+    started = time.perf_counter()
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= limit:
+            chunk = "".join(buffer).encode()
+            add_render_time(time.perf_counter() - started)
+            yield chunk
+            started = time.perf_counter()
+            buffer = []
+            size = 0
+            limit = STREAM_CHUNK_BYTES
+    chunk = "".join(buffer).encode()
+    add_render_time(time.perf_counter() - started)
+    if chunk:
+        yield chunk
+
+
+def _gzip(chunks: Iterator[bytes], level: int) -> Iterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        # a sync flush makes every chunk decodable as soon as it arrives
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def _accepts_gzip(request: Request) -> bool:
+    for coding in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() == "gzip":
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00")
+    return False
+
+
+def stream_template(
+    request: Request, name: str, context: dict[str, Any]
+) -> StreamingResponse:
+    """Render `name` incrementally instead of building the page in memory.
+
+    Data must already be in `context`; an error raised while rendering
+    can only abort the connection, since the status line is already sent.
+    """
+    template = templates.get_template(name)
+    chunks = _chunks(template.generate({"request": request, **context}))
+
+    headers = {"Vary": "Accept-Encoding"}
+    if STREAM_GZIP_LEVEL > 0 and _accepts_gzip(request):
+        chunks = _gzip(chunks, STREAM_GZIP_LEVEL)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type="text/html", headers=headers)
+
+
+if __name__ == "__main__":
+    # fills the bytecode cache, e.g. while building an image
+    print(f"compiled {warm_up_templates()} templates")
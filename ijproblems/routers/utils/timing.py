@@ -0,0 +1,92 @@
+import json
+import logging
+import os
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ijproblems.internal_functions.timing import RequestTimings, request_timings
+
+# one JSON line per request on the "ijproblems.timing" logger
+REQUEST_TIMING_LOG = bool(os.environ.get("REQUEST_TIMING_LOG"))
+
+logger = logging.getLogger("ijproblems.timing")
+if REQUEST_TIMING_LOG:
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler())
+    logger.propagate = False
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 2)
+
+
+def server_timing(timings: RequestTimings) -> str:
+    total = timings.elapsed()
+    app = max(total - timings.call_seconds - timings.render_seconds, 0.0)
+    return ", ".join(
+        [
+            f'db;dur={_ms(timings.call_seconds)};desc="{timings.call_count} calls"',
+            f'sql;dur={_ms(timings.sql_seconds)};desc="{timings.sql_count} queries"',
+            f"render;dur={_ms(timings.render_seconds)}",
+            f"app;dur={_ms(app)}",
+            f"total;dur={_ms(total)}",
+        ]
+    )
+
+
+def _log(scope: Scope, status: int, timings: RequestTimings) -> None:
+    record = {
+        "method": scope["method"],
+        "path": scope["path"],
+        "status": status,
+        "total_ms": _ms(timings.elapsed()),
+        "db_ms": _ms(timings.call_seconds),
+        "sql_ms": _ms(timings.sql_seconds),
+        "sql_count": timings.sql_count,
+        "render_ms": _ms(timings.render_seconds),
+        "calls": {
+            name: {"count": int(count), "ms": _ms(seconds)}
+            for name, (count, seconds) in timings.calls.items()
+        },
+    }
+    logger.info(json.dumps(record))
+
+
+class ServerTimingMiddleware:
+    """Reports `RequestTimings` in a `Server-Timing` header and the log.
+
+    The header is sent before a streamed body is rendered, so it only has
+    the render time of what was rendered in the route; the log line is
+    written at the end and has all of it.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = request_timings.set(timings)
+        status = 0
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", server_timing(timings))
+            elif message["type"] == "http.response.body" and not message.get(
+                "more_body", False
+            ):
+                if REQUEST_TIMING_LOG:
+                    _log(scope, status, timings)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_timings.reset(token)
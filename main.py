@@ -1,22 +1,55 @@
 import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 
 import uvicorn
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from starlette.middleware.sessions import SessionMiddleware
 
+import ijproblems.routers.apis.data as data
 import ijproblems.routers.apis.github_callback as github_callback
 import ijproblems.routers.apis.like as like
+import ijproblems.routers.apis.metrics as metrics
+import ijproblems.routers.apis.rank as rank
 import ijproblems.routers.pages.problems as problems
 import ijproblems.routers.pages.ranking as ranking
 import ijproblems.routers.pages.statistics as statistics
 import ijproblems.routers.pages.user as user
+from ijproblems.internal_functions.github_app import close_github_client
+from ijproblems.internal_functions.timing import REQUEST_TIMING
+from ijproblems.routers.utils.database import (
+    close_pools,
+    load_solved_index,
+    open_pools,
+    start_listeners,
+    stop_listeners,
+)
+from ijproblems.routers.utils.metrics import MetricsMiddleware
+from ijproblems.routers.utils.templates import warm_up_templates
+from ijproblems.routers.utils.timing import ServerTimingMiddleware
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    warm_up_templates()
+    await open_pools()
+    start_listeners()
+    await load_solved_index()
+    yield
+    await stop_listeners()
+    await close_pools()
+    await close_github_client()
+
+
+app = FastAPI(lifespan=lifespan)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
+app.include_router(data.router)
 app.include_router(github_callback.router)
 app.include_router(like.router)
+app.include_router(metrics.router)
+app.include_router(rank.router)
 app.include_router(problems.router)
 app.include_router(statistics.router)
 app.include_router(user.router)
@@ -24,6 +57,9 @@ app.include_router(ranking.router)
 
 secret = os.environ.get("SESSION_SECRET", "ija")
 app.add_middleware(SessionMiddleware, secret_key=secret)
+if REQUEST_TIMING:
+    app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,8 @@
+CREATE TABLE data_versions (
+  name        VARCHAR(64) NOT NULL,
+  version     BIGINT NOT NULL,
+  updated_at  TIMESTAMP NOT NULL,
+  PRIMARY KEY (name)
+);
+INSERT INTO data_versions (name, version, updated_at)
+VALUES ('catalog', 1, now() AT TIME ZONE 'UTC');
@@ -0,0 +1,12 @@
+-- likes = problems.inherited_likes + COUNT(likes), maintained by the like API
+CREATE TABLE problem_likes (
+  problem_id  INTEGER NOT NULL,
+  likes       INTEGER NOT NULL,
+  PRIMARY KEY (problem_id)
+);
+
+INSERT INTO problem_likes (problem_id, likes)
+SELECT P.problem_id, P.inherited_likes + COUNT(L.github_id)
+FROM problems AS P
+LEFT JOIN likes AS L ON P.problem_id = L.problem_id
+GROUP BY P.problem_id;
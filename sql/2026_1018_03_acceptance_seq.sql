@@ -0,0 +1,3 @@
+-- insertion order of acceptances, tailed by the web workers' solved index
+ALTER TABLE aoj_acceptances ADD COLUMN seq BIGSERIAL NOT NULL;
+CREATE INDEX ON aoj_acceptances (seq);
@@ -0,0 +1,22 @@
+-- global ranking snapshot, rebuilt by the crawler after recomputing points
+--   position: 1-based row number in display order, used for paging
+--   rank:     competition rank (ties share a rank, e.g. 1, 2, 2, 4)
+CREATE TABLE user_ranks (
+  contest_type      INTEGER NOT NULL,
+  position          INTEGER NOT NULL,
+  rank              INTEGER NOT NULL,
+  aoj_userid        VARCHAR(64) NOT NULL,
+  total             INTEGER NOT NULL,
+  counts_per_levels VARCHAR(255) NOT NULL,
+  PRIMARY KEY (contest_type, position)
+);
+
+INSERT INTO user_ranks
+  (contest_type, position, rank, aoj_userid, total, counts_per_levels)
+SELECT contest_type,
+  ROW_NUMBER() OVER (PARTITION BY contest_type ORDER BY total DESC, aoj_userid),
+  RANK() OVER (PARTITION BY contest_type ORDER BY total DESC),
+  aoj_userid,
+  total,
+  counts_per_levels
+FROM user_points;
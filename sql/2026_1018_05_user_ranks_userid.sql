@@ -0,0 +1,2 @@
+-- looking up the rank of one user
+CREATE UNIQUE INDEX ON user_ranks (contest_type, aoj_userid);
@@ -0,0 +1,6 @@
+-- crawl: bumped by the crawler whenever it stores new acceptances
+-- likes: bumped whenever a like is added or removed
+INSERT INTO data_versions (name, version, updated_at)
+VALUES
+  ('crawl', 1, now() AT TIME ZONE 'UTC'),
+  ('likes', 1, now() AT TIME ZONE 'UTC');
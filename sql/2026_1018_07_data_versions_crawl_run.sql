@@ -0,0 +1,4 @@
+-- crawl_run: bumped by the crawler on every successful commit, even when
+-- nothing changed, so that its age tells whether the crawler is alive
+INSERT INTO data_versions (name, version, updated_at)
+VALUES ('crawl_run', 1, now() AT TIME ZONE 'UTC');
@@ -0,0 +1,12 @@
+-- solvers = COUNT(aoj_acceptances), maintained by the crawler
+CREATE TABLE problem_solvers (
+  problem_id  INTEGER NOT NULL,
+  solvers     INTEGER NOT NULL,
+  PRIMARY KEY (problem_id)
+);
+
+INSERT INTO problem_solvers (problem_id, solvers)
+SELECT P.problem_id, COUNT(A.aoj_userid)
+FROM problems AS P
+LEFT JOIN aoj_acceptances AS A ON P.problem_id = A.problem_id
+GROUP BY P.problem_id;
@@ -0,0 +1,4 @@
+-- version: bumped with likes by every change of the counter, so that pages
+-- showing like counts are versioned per problem instead of by one row that
+-- every like would update
+ALTER TABLE problem_likes ADD COLUMN version BIGINT NOT NULL DEFAULT 0;
@@ -0,0 +1,107 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from ijproblems.internal_functions import invalidation
+from ijproblems.internal_functions.interface import DataVersion
+from ijproblems.internal_functions.invalidation import (
+    Event,
+    InvalidationBus,
+    InvalidationListener,
+)
+
+STARTED_AT = datetime(2026, 10, 18)
+
+
+def _payload(**event: object) -> str:
+    return json.dumps(event)
+
+
+def test_dispatch_survives_a_failing_handler() -> None:
+    bus = InvalidationBus()
+    bus.connect({"catalog": DataVersion(version=1, updated_at=STARTED_AT)})
+    received: list[Event] = []
+
+    def failing(event: Event) -> None:
+        raise TypeError("problem_ids is not a list")
+
+    bus.subscribe("catalog", failing)
+    bus.subscribe("catalog", received.append)
+    bus.dispatch(
+        _payload(
+            data="catalog",
+            version=2,
+            updated_at="2026-10-18T12:00:00.000000",
+            problem_ids=1001,
+        )
+    )
+
+    assert len(received) == 1
+    assert bus.version("catalog") == 2
+
+
+def test_dispatch_ignores_malformed_payloads() -> None:
+    bus = InvalidationBus()
+    bus.connect({})
+    received: list[Event] = []
+    bus.subscribe("catalog", received.append)
+
+    for payload in ["not json", "[1]", _payload(version=2)]:
+        bus.dispatch(payload)
+
+    assert received == []
+
+
+def test_dispatch_keeps_versions_monotonic() -> None:
+    bus = InvalidationBus()
+    bus.connect({"crawl": DataVersion(version=5, updated_at=STARTED_AT)})
+
+    bus.dispatch(_payload(data="crawl", version=4, updated_at="2026-10-18T00:00:00"))
+
+    assert bus.version("crawl") == 5
+
+
+def test_events_without_a_version_reach_handlers() -> None:
+    bus = InvalidationBus()
+    bus.connect({})
+    received: list[Event] = []
+    bus.subscribe("likes", received.append)
+
+    bus.dispatch(_payload(data="likes", problem_id=1001, like_version=3))
+
+    assert received == [{"data": "likes", "problem_id": 1001, "like_version": 3}]
+    assert bus.versions() == {}
+
+
+def test_listener_reconnects_after_any_error(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(invalidation, "INVALIDATION_RETRY_SECOND", 0.0)
+    bus = InvalidationBus()
+    resets: list[bool] = []
+    bus.on_reset(resets.append)
+    listener = InvalidationListener("", bus)
+    attempts = 0
+
+    async def listen() -> None:
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise RuntimeError("handler bug")
+        bus.connect({})
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(listener, "_listen", listen)
+
+    async def run() -> None:
+        listener.start()
+        for _ in range(100):
+            if bus.connected:
+                break
+            await asyncio.sleep(0.01)
+        await listener.stop()
+
+    asyncio.run(run())
+
+    assert attempts == 2
+    assert resets == [False, True, False]
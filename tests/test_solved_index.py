@@ -0,0 +1,96 @@
+import pytest
+
+from ijproblems.internal_functions.catalog import ProblemCatalog
+from ijproblems.internal_functions.interface import ProblemInfo
+from ijproblems.internal_functions.solved_index import SolvedIndex, SolvedProblems
+
+
+def _index() -> SolvedIndex:
+    index = SolvedIndex(refresh_interval_second=10)
+    index.apply(
+        [
+            ("alice", 1001, 1),
+            ("alice", 1002, 2),
+            ("bob", 1002, 3),
+            ("bob", 1003, 4),
+        ]
+    )
+    return index
+
+
+def _problem(aoj_id: int, contest_type: int, level: int) -> ProblemInfo:
+    return ProblemInfo(
+        contest_type=contest_type,
+        name=f"Problem {aoj_id}",
+        level=level,
+        aoj_id=aoj_id,
+        org="ICPC",
+        year=2026,
+    )
+
+
+def _catalog(version: int, *problems: ProblemInfo) -> ProblemCatalog:
+    return ProblemCatalog.build(version, problems)
+
+
+def test_operators_stay_bitsets() -> None:
+    index = _index()
+    alice = index.solved("alice")
+    bob = index.solved("bob")
+
+    both = alice & bob
+    either = alice | bob
+    only_alice = alice - bob
+    only_one = alice ^ bob
+
+    for result in (both, either, only_alice, only_one):
+        assert isinstance(result, SolvedProblems)
+    assert set(both) == {1002}
+    assert set(either) == {1001, 1002, 1003}
+    assert set(only_alice) == {1001}
+    assert set(only_one) == {1001, 1003}
+    assert len(either) == 3
+
+
+def test_operators_reject_another_index() -> None:
+    alice = _index().solved("alice")
+    other = _index().solved("alice")
+    with pytest.raises(ValueError):
+        alice & other
+    with pytest.raises(ValueError):
+        alice | other
+    with pytest.raises(ValueError):
+        alice - other
+
+
+def test_operators_with_plain_sets() -> None:
+    alice = _index().solved("alice")
+    assert alice & {1002, 1003} == {1002}
+    assert alice - {1002} == {1001}
+    assert (alice | {1004}) == {1001, 1002, 1004}
+
+
+def test_level_counts() -> None:
+    index = _index()
+    catalog = _catalog(
+        1,
+        _problem(1001, 0, 1),
+        _problem(1002, 0, 3),
+        _problem(1003, 0, 3),
+        _problem(1004, 1, 1),
+    )
+    assert index.level_counts("alice", catalog, 0) == [1, 0, 1] + [0] * 8
+    assert index.level_counts("Bob", catalog, 0) == [0, 0, 2] + [0] * 8
+    assert index.level_counts("carol", catalog, 0) == [0] * 11
+    assert index.level_counts("alice", catalog, 1) == [0] * 9
+
+
+def test_level_masks_follow_catalog_version() -> None:
+    index = _index()
+    catalog = _catalog(1, _problem(1001, 0, 1))
+    masks = index.level_masks(catalog, 0)
+    assert index.level_masks(catalog, 0) is masks
+
+    moved = _catalog(2, _problem(1001, 0, 2))
+    assert index.level_masks(moved, 0) is not masks
+    assert index.level_counts("alice", moved, 0)[:2] == [0, 1]